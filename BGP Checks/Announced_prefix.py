@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
-import requests
-from datetime import datetime, timedelta, timezone
+from bgplay_fetch import day_windows
+from prefix_trie import PrefixTrie
+from ripestat_announced import announced_by_day
+from ripestat_cache import default_cache
+from ripestat_client import default_client
 
 # === Parameters ===
 prefix = "102.217.0.0/22"
@@ -12,46 +15,57 @@ dolphin_asn = "37613"    # Dolphin
 first_day_str = "2025-09-01"
 last_day_str  = "2025-09-30"
 
-first_day = datetime.fromisoformat(first_day_str).replace(tzinfo=timezone.utc)
-last_day  = datetime.fromisoformat(last_day_str).replace(tzinfo=timezone.utc)
-current_day = first_day
-
-# RIPEstat announced-prefixes API
-announced_url = "https://stat.ripe.net/data/announced-prefixes/data.json"
-
-while current_day.date() <= last_day.date():
-    day_start = current_day.replace(hour=0, minute=0, second=0)
-    day_end   = current_day.replace(hour=23, minute=59, second=59)
-    
-    start_iso = day_start.isoformat()
-    end_iso   = day_end.isoformat()
-
-    def get_announced_prefixes(asn):
-        params = {
-            "resource": str(asn),
-            "starttime": start_iso,
-            "endtime": end_iso
-        }
-        resp = requests.get(announced_url, params=params)
-        resp.raise_for_status()
-        data = resp.json().get("data", {})
-        # Extract the "prefix" field from each dict
-        prefixes = [p["prefix"] for p in data.get("prefixes", []) if "prefix" in p]
-        return prefixes
-
-    my_prefixes = get_announced_prefixes(my_asn)
-    glo_prefixes = get_announced_prefixes(glo_asn)
-    dolphin_prefixes = get_announced_prefixes(dolphin_asn)
+windows = day_windows(first_day_str, last_day_str)
+
+# RIPEstat announced-prefixes: one query per ASN for the whole range, run concurrently
+announced = announced_by_day([my_asn, glo_asn, dolphin_asn], windows)
+
+# One prefix trie per ASN for the whole run: prefix -> set of days it was announced
+tries = {}
+for asn, by_day in announced.items():
+    trie = tries[asn] = PrefixTrie()
+    for day_str, prefixes in by_day.items():
+        for p in prefixes:
+            trie.setdefault(p, set()).add(day_str)
+
+
+def announces(asn, day_str):
+    """True if asn announced exactly our prefix on day_str."""
+    return day_str in tries[asn].get(prefix, ())
+
+
+def related_prefixes(asn, day_str):
+    """Covering aggregates and more-specifics of our prefix that asn announced on day_str."""
+    trie = tries[asn]
+    covering = [p for p, days in trie.covering(prefix, include_exact=False) if day_str in days]
+    more_specific = [p for p, days in trie.more_specifics(prefix) if day_str in days]
+    return covering, more_specific
+
+
+for current_day, _, _ in windows:
+    day_str = current_day.strftime('%Y-%m-%d')
+    my_prefixes = announced[my_asn][day_str]
+    glo_prefixes = announced[glo_asn][day_str]
+    dolphin_prefixes = announced[dolphin_asn][day_str]
 
     # Check if they are announcing your specific prefix
-    my_yes = prefix in my_prefixes
-    glo_yes = prefix in glo_prefixes
-    dolphin_yes = prefix in dolphin_prefixes
+    my_yes = announces(my_asn, day_str)
+    glo_yes = announces(glo_asn, day_str)
+    dolphin_yes = announces(dolphin_asn, day_str)
 
-    print(f"{current_day.strftime('%Y-%m-%d')}")
+    print(f"{day_str}")
     print(f"  My ASN ({my_asn}) announces {len(my_prefixes)} prefixes: {', '.join(my_prefixes)}")
     print(f"  GLO ({glo_asn}) announces {len(glo_prefixes)} prefixes: {', '.join(glo_prefixes)}")
     print(f"  Dolphin ({dolphin_asn}) announces {len(dolphin_prefixes)} prefixes: {', '.join(dolphin_prefixes)}")
-    print(f"  Is {prefix} announced? Me: {'Yes' if my_yes else 'No'}, GLO: {'Yes' if glo_yes else 'No'}, Dolphin: {'Yes' if dolphin_yes else 'No'}\n")
+    print(f"  Is {prefix} announced? Me: {'Yes' if my_yes else 'No'}, GLO: {'Yes' if glo_yes else 'No'}, Dolphin: {'Yes' if dolphin_yes else 'No'}")
+
+    # Covering aggregates and more-specific (e.g. /23, /24) announcements of the prefix
+    for name, asn in [("Me", my_asn), ("GLO", glo_asn), ("Dolphin", dolphin_asn)]:
+        covering, more_specific = related_prefixes(asn, day_str)
+        if covering or more_specific:
+            print(f"  {name} ({asn}) covering: {', '.join(covering) or 'none'} | more-specifics: {', '.join(more_specific) or 'none'}")
+    print()
 
-    current_day += timedelta(days=1)
+# Report how much of the run was served from the on-disk cache, and how the network requests went
+print(default_cache().summary())
+print(default_client().summary())
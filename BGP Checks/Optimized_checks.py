@@ -1,8 +1,16 @@
 #!/usr/bin/env python3
-import requests
-from datetime import datetime, timedelta, timezone
 import csv
+import json
 import os
+from datetime import datetime, timezone
+
+from audit_checkpoint import DayCheckpoint, source_digest
+from bgplay_fetch import day_windows, fetch_days
+from bgplay_replay import OriginWatch, ReplayState, parse_bgplay, upstream_presence
+from bgplay_stream import stream_upstream_presence
+from ripestat_cache import default_cache
+from ripestat_client import default_client
+from rpki_vrp import RpkiStats, load_vrps
 
 # === Parameters ===
 prefix = "102.217.0.0/22"
@@ -14,97 +22,163 @@ dolphin_asn = "37613"    # Dolphin
 first_day_str = "2025-09-01"
 last_day_str  = "2025-09-30"
 
-first_day = datetime.fromisoformat(first_day_str).replace(tzinfo=timezone.utc)
-last_day  = datetime.fromisoformat(last_day_str).replace(tzinfo=timezone.utc)
-current_day = first_day
+# Concurrent BGPlay downloads (days are still evaluated in date order)
+max_workers = 4
+
+# Days per BGPlay query; the wide window is split into days locally (1 = one query per day)
+chunk_days = 7
+
+# Parse all-collector responses incrementally instead of resp.json() (pip install ijson).
+# Off by default: a streamed body is replayed as one day, so it always queries one day at a
+# time and chunk_days has no effect. Turn it on when single days are too large to decode
+streaming = False
+
+# Checkpointed run: every day is appended to the CSV as soon as it is done and a rerun
+# skips the days already recorded (False = start the CSV afresh)
+resume = True
+
+# Also fetch the recorded days again (normally from the cache) and redo those whose data changed
+recheck_changed = False
+
+# Routes seen for our space with another origin AS, or for more-specifics not listed here, are
+# reported as possible hijacks/leaks (counts in the CSV, details in anomalies_<range>.csv)
+expected_prefixes = [prefix]
+expected_origins = [my_asn]
+
+# RPKI origin validation of every observed route against a local VRP export (routinator /
+# rpki-client JSON or CSV, e.g. "vrps.json"); None = skip. Loaded once for the whole run
+vrp_file = None
 
-bgplay_url = "https://stat.ripe.net/data/bgplay/data.json"
+# Also keep the results in the Parquet route-history store (pip install pyarrow); None = CSV only
+store_dir = None
 
 # Directory to save CSV
 csv_dir = r"C:\Users\SuleimanAbdulsalam\OneDrive - Kasi, Inc\Routes Check 2025"
 os.makedirs(csv_dir, exist_ok=True)
 
-# Prepare CSV file path for the whole month
+# CSV file for the whole month, with its checkpoint state next to it
 csv_filename = os.path.join(csv_dir, f"data_{first_day_str}_to_{last_day_str}.csv")
-with open(csv_filename, mode="w", newline="") as csvfile:
-    writer = csv.writer(csvfile)
-    writer.writerow(["Date", "GLO_upstream", "Dolphin_upstream"])
-
-    # Loop over each day
-    while current_day.date() <= last_day.date():
-        day_start = current_day.replace(hour=0, minute=0, second=0)
-        day_end   = current_day.replace(hour=23, minute=59, second=59)
-
-        # Fetch BGPlay data for the day, all collectors
-        params = {
-            "resource": prefix,
-            "starttime": day_start.isoformat(),
-            "endtime": day_end.isoformat(),
-            "unix_timestamps": "true",
-            "collectors": ""  # empty = all collectors
-        }
-        resp = requests.get(bgplay_url, params=params)
-        resp.raise_for_status()
-        data = resp.json().get("data", {})
-
-        initial_state = data.get("initial_state", []) or []
-        events = sorted(data.get("events", []) or [], key=lambda e: int(float(e.get("timestamp", 0))))
-
-        # Build optimized timestamps list: start-of-day + event timestamps +/- buffer
-        event_ts_set = set()
-        for ev in events:
-            ev_ts = int(float(ev.get("timestamp", 0)))
-            if ev_ts <= int(day_end.timestamp()):
-                # add buffer timestamps around each event
-                event_ts_set.update({ev_ts-1, ev_ts, ev_ts+1})
-        timestamps = sorted({int(day_start.timestamp())} | event_ts_set)
-
-        # Flags to track if GLO/Dolphin appear this day
-        glo_yes = False
-        dolphin_yes = False
-
-        for ts in timestamps:
-            # Rebuild active paths from scratch at this timestamp
-            active_paths = [[str(x) for x in st.get("path") or st.get("as_path") or []]
-                            for st in initial_state if st.get("path") or st.get("as_path")]
-
-            # Apply all events up to current timestamp
-            for ev in events:
-                ev_ts = int(float(ev.get("timestamp", 0)))
-                if ev_ts > ts:
-                    break
-                typ = str(ev.get("type", "")).lower()
-                path = [str(x) for x in ev.get("path") or ev.get("as_path") or []]
-                if not path:
-                    continue
-                if "announce" in typ or typ == "a":
-                    active_paths.append(path)
-                elif "withdraw" in typ or typ == "w":
-                    try:
-                        active_paths.remove(path)
-                    except ValueError:
-                        pass
-
-            # Filter paths where my ASN is the origin
-            paths_with_my_asn = [p for p in active_paths if p and str(p[-1]) == my_asn]
-
-            # Check if GLO/Dolphin appear in any path
-            if any(str(glo_asn) in p[:-1] for p in paths_with_my_asn):
-                glo_yes = True
-            if any(str(dolphin_asn) in p[:-1] for p in paths_with_my_asn):
-                dolphin_yes = True
-
-            # Stop checking further timestamps if both already yes
-            if glo_yes and dolphin_yes:
-                break
-
-        # Write result to CSV
-        writer.writerow([current_day.strftime('%Y-%m-%d'),
-                         "Yes" if glo_yes else "No",
-                         "Yes" if dolphin_yes else "No"])
-
-        # Print result to console
-        print(f"{current_day.strftime('%Y-%m-%d')} | GLO upstream: {'Yes' if glo_yes else 'No'} | Dolphin upstream: {'Yes' if dolphin_yes else 'No'}")
-
-        # Move to next day
-        current_day += timedelta(days=1)
+churn_fields = ["announcements", "withdrawals", "path_changes", "flaps"]
+checkpoint = DayCheckpoint(csv_filename, ["Date", "GLO_upstream", "Dolphin_upstream",
+                                          "GLO_seconds", "Dolphin_seconds", "GLO_peer_pct", "Dolphin_peer_pct"]
+                           + [f"{name}_{field}" for name in ("GLO", "Dolphin") for field in churn_fields]
+                           + ["Unexpected_origins", "Unexpected_more_specifics"]
+                           + (["RPKI_valid", "RPKI_invalid", "RPKI_not_found"] if vrp_file else []),
+                           resume=resume)
+anomalies_filename = os.path.join(csv_dir, f"anomalies_{first_day_str}_to_{last_day_str}.csv")
+if not resume and os.path.exists(anomalies_filename):
+    os.remove(anomalies_filename)
+windows = day_windows(first_day_str, last_day_str)
+if not recheck_changed:
+    windows = checkpoint.pending(windows)
+    print(f"{len(windows)} day(s) left to check")
+vrps = load_vrps(vrp_file, expected_prefixes) if vrp_file else None
+if store_dir:
+    from route_store import RouteStore
+    store = RouteStore(store_dir)
+
+# Loop over each day as its BGPlay data arrives
+days = fetch_days(prefix, windows,
+                  extra_params={"collectors": ""},  # empty = all collectors
+                  max_workers=max_workers, chunk_days=chunk_days, stream=streaming)
+for current_day, day_start, day_end, data in days:
+    day_str = current_day.strftime('%Y-%m-%d')
+    digest = source_digest(data)
+    if checkpoint.done(day_str, digest):
+        if streaming:
+            data.close()
+        print(f"{day_str} | unchanged, skipped")
+        continue
+
+    # Replay the day once: presence, seconds carried, share of collector peers and update churn per upstream,
+    # plus any route for our space that is not ours
+    state = ReplayState(my_asn, [glo_asn, dolphin_asn])
+    watch = OriginWatch(state, expected_prefixes, int(day_start.timestamp()), int(day_end.timestamp()),
+                        expected_origins)
+    rpki = RpkiStats(state, vrps, int(day_start.timestamp()), int(day_end.timestamp())) if vrps else None
+    presence = None
+    if streaming:
+        with data:
+            try:
+                presence = stream_upstream_presence(state, data, int(day_start.timestamp()),
+                                                    int(day_end.timestamp()), with_intervals=bool(store_dir),
+                                                    with_churn=True, origin_watch=watch, rpki=rpki)
+            except ValueError as e:
+                # Events out of order: decode the whole body and replay the day from scratch
+                print(f"{day_str} | {e}, replaying the full response")
+                data.seek(0)
+                data = json.load(data).get("data", {})
+                state = ReplayState(my_asn, [glo_asn, dolphin_asn])
+                watch = OriginWatch(state, expected_prefixes, int(day_start.timestamp()),
+                                    int(day_end.timestamp()), expected_origins)
+                rpki = RpkiStats(state, vrps, int(day_start.timestamp()), int(day_end.timestamp())) if vrps else None
+    if presence is None:
+        initial_state, events = parse_bgplay(data)
+        state.load(initial_state)
+        presence = upstream_presence(state, events, int(day_start.timestamp()), int(day_end.timestamp()),
+                                     with_intervals=bool(store_dir), with_churn=True, origin_watch=watch, rpki=rpki)
+    glo = presence[glo_asn]
+    dolphin = presence[dolphin_asn]
+    anomalies = watch.results()
+    bad_origins = sum(1 for a in anomalies if "origin" in a["reason"])
+    more_specifics = len({a["prefix"] for a in anomalies if "more-specific" in a["reason"]})
+    validation = rpki.results() if rpki else None
+
+    # Details of every unexpected route, one row per (prefix, origin). Rows an earlier run left for
+    # this day (a crash before its checkpoint, or a recheck_changed redo) are replaced, not duplicated
+    new_file = not os.path.exists(anomalies_filename)
+    kept = None
+    if not new_file:
+        with open(anomalies_filename, newline="") as f:
+            rows = list(csv.reader(f))[1:]
+        if any(row and row[0] == day_str for row in rows):
+            kept = [row for row in rows if row and row[0] != day_str]
+    if anomalies or kept is not None:
+        out_filename = anomalies_filename if kept is None else anomalies_filename + ".tmp"
+        with open(out_filename, mode="a" if kept is None else "w", newline="") as f:
+            writer = csv.writer(f)
+            if new_file or kept is not None:
+                writer.writerow(["Date", "Prefix", "Origin", "Reason", "First_seen", "Until", "Peers", "Example_path"])
+                writer.writerows(kept or [])
+            for a in anomalies:
+                writer.writerow([day_str, a["prefix"], a["origin"], a["reason"],
+                                 datetime.fromtimestamp(a["start"], timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+                                 datetime.fromtimestamp(a["end"], timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+                                 " ".join(a["peers"]), " ".join(a["path"])])
+        if kept is not None:
+            os.replace(out_filename, anomalies_filename)
+
+    # Store the day before marking it done, so a resumed run never misses it
+    if store_dir:
+        store.add_day(current_day, prefix, my_asn, presence, {glo_asn: "GLO", dolphin_asn: "Dolphin"})
+        store.flush()
+
+    # Append the day to the CSV and mark it done
+    checkpoint.append(day_str, [day_str,
+                                "Yes" if glo["seen"] else "No",
+                                "Yes" if dolphin["seen"] else "No",
+                                glo["dwell_seconds"], dolphin["dwell_seconds"],
+                                f"{100 * glo['peer_share']:.1f}", f"{100 * dolphin['peer_share']:.1f}"]
+                      + [p[field] for p in (glo, dolphin) for field in churn_fields]
+                      + [bad_origins, more_specifics]
+                      + ([validation["valid"], validation["invalid"], validation["not_found"]] if validation else []),
+                      digest)
+
+    # Print result to console
+    print(f"{day_str} | GLO upstream: {'Yes' if glo['seen'] else 'No'} "
+          f"({glo['dwell_seconds']}s, {100 * glo['peer_share']:.0f}% of peers, {glo['flaps']} flaps) | "
+          f"Dolphin upstream: {'Yes' if dolphin['seen'] else 'No'} "
+          f"({dolphin['dwell_seconds']}s, {100 * dolphin['peer_share']:.0f}% of peers, {dolphin['flaps']} flaps)")
+    for a in anomalies:
+        print(f"  WARNING {a['prefix']} seen with origin AS{a['origin']} ({a['reason']}) "
+              f"by {len(a['peers'])} peer(s), path {' '.join(a['path'])}")
+    for r in validation["invalid_routes"] if validation else []:
+        print(f"  RPKI INVALID {r['prefix']} from AS{r['origin']}: {r['observations']} observation(s) "
+              f"by {len(r['peers'])} peer(s)")
+
+# Put the CSV in date order with one row per day
+checkpoint.finish()
+
+# Report how much of the run was served from the on-disk cache, and how the network requests went
+print(default_cache().summary())
+print(default_client().summary())
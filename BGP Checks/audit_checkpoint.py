@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Per-day checkpointing for the month audit scripts.
+
+Each finished day is appended to the CSV and flushed to disk straight away,
+and its date is recorded in a small state file next to the CSV together
+with a digest of the BGPlay data it was computed from. A rerun skips the
+recorded days, so a crash only costs the day in progress. With a recheck,
+recorded days are fetched again (normally from the response cache) and
+reprocessed only if their source data changed.
+
+The state file is written after the CSV row, so a crash in between only
+leaves a duplicate row; finish() rewrites the CSV in date order with one
+row per day.
+"""
+import csv
+import hashlib
+import json
+import os
+
+READ_CHUNK_BYTES = 1024 * 1024
+
+
+def source_digest(data):
+    """sha256 of a day's BGPlay data: a decoded dict or an open binary file (rewound after)."""
+    h = hashlib.sha256()
+    if hasattr(data, "read"):
+        data.seek(0)
+        for chunk in iter(lambda: data.read(READ_CHUNK_BYTES), b""):
+            h.update(chunk)
+        data.seek(0)
+    else:
+        h.update(json.dumps(data, sort_keys=True, separators=(",", ":")).encode())
+    return h.hexdigest()
+
+
+def _fsync_replace(tmp, filename):
+    with open(tmp, "rb+") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, filename)
+
+
+class DayCheckpoint:
+    def __init__(self, csv_filename, header, resume=True):
+        """With resume=False any earlier progress is discarded and the CSV started afresh."""
+        self.csv_filename = csv_filename
+        self.state_filename = csv_filename + ".state.json"
+        self.header = list(header)
+        # {date string: source digest}
+        self.days = {}
+        if resume and os.path.exists(self.state_filename) and os.path.exists(csv_filename):
+            with open(self.state_filename) as f:
+                state = json.load(f)
+            if state.get("header") == self.header:
+                self.days = state.get("days", {})
+        if not self.days:
+            # Nothing usable to resume from (or the columns changed): start a fresh CSV
+            with open(csv_filename, mode="w", newline="") as f:
+                csv.writer(f).writerow(self.header)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def done(self, day_str, digest=None):
+        """True if day_str was recorded (and, when digest is given, from the same data)."""
+        if day_str not in self.days:
+            return False
+        return digest is None or self.days[day_str] == digest
+
+    def pending(self, windows):
+        """The (day, day_start, day_end) windows that have not been recorded yet."""
+        return [w for w in windows if not self.done(w[0].strftime('%Y-%m-%d'))]
+
+    def append(self, day_str, row, digest=None):
+        """Durably appends one day's CSV row, then marks the day done."""
+        with open(self.csv_filename, mode="a", newline="") as f:
+            csv.writer(f).writerow(row)
+            f.flush()
+            os.fsync(f.fileno())
+        self.days[day_str] = digest
+        tmp = self.state_filename + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"header": self.header, "days": self.days}, f)
+        _fsync_replace(tmp, self.state_filename)
+
+    def finish(self):
+        """Rewrites the CSV sorted by date, keeping the latest row for each recorded day."""
+        with open(self.csv_filename, newline="") as f:
+            rows = list(csv.reader(f))[1:]
+        latest = {row[0]: row for row in rows if row and row[0] in self.days}
+        tmp = self.csv_filename + ".tmp"
+        with open(tmp, mode="w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(self.header)
+            writer.writerows(latest[day] for day in sorted(latest))
+        _fsync_replace(tmp, self.csv_filename)
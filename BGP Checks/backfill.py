@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Multi-core backfill of the batch audit.
+
+Same prefixes, upstreams and settings as batch_audit.py (audit_config.py),
+but each (prefix, run of chunk_days days) job is fetched and replayed in a
+worker process, so a year of cached days uses every core instead of one.
+Workers send back only the per-day presence dicts. The parent writes them
+in date and prefix order, whatever order the jobs finish in. A failed job
+does not stop the run: its days are marked "Error" in the CSV, left out of
+the store, and listed at the end.
+
+The data should already be in the response cache (e.g. from an earlier
+batch_audit.py run). Uncached days are still fetched, but every worker has
+its own RIPEstat client limited to REQUESTS_PER_SECOND / processes, so the
+run as a whole stays within the usual request rate.
+
+Examples:
+    python backfill.py
+    python backfill.py --from 2024-01-01 --to 2024-12-31 --processes 16
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import audit_config as cfg
+from bgplay_fetch import chunk_windows, day_windows, fetch_chunk
+from bgplay_replay import PathTable, ReplayState, parse_bgplay, upstream_presence
+from ripestat_client import BURST, REQUESTS_PER_SECOND, RipestatClient
+
+# Per-process RIPEstat client, set up by init_worker()
+_client = None
+
+
+def init_worker(rate, burst):
+    """Worker initializer: one client per process with its share of the request rate."""
+    global _client
+    _client = RipestatClient(rate=rate, burst=burst)
+
+
+def replay_job(prefix, origin, upstream_asns, chunk, extra_params, with_store):
+    """
+    Worker: fetches and replays one run of days for one prefix; with_store
+    adds the presence intervals and update churn the route store keeps.
+
+    Returns (prefix, [(date string, presence), ...], None), or
+    (prefix, [(date string, None), ...], error text) if anything failed.
+    """
+    try:
+        table = PathTable(origin, upstream_asns)
+        results = []
+        for current_day, day_start, day_end, data in fetch_chunk(prefix, chunk, extra_params, _client):
+            initial_state, events = parse_bgplay(data)
+            state = ReplayState(origin, upstream_asns, table)
+            state.load(initial_state)
+            presence = upstream_presence(state, events, int(day_start.timestamp()), int(day_end.timestamp()),
+                                         with_store, with_store)
+            results.append((current_day.strftime('%Y-%m-%d'), presence))
+        return prefix, results, None
+    except Exception:
+        return prefix, [(day.strftime('%Y-%m-%d'), None) for day, _, _ in chunk], traceback.format_exc(limit=3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel multi-day batch audit backfill")
+    parser.add_argument("--from", dest="first_day", default=cfg.FIRST_DAY)
+    parser.add_argument("--to", dest="last_day", default=cfg.LAST_DAY)
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-days", type=int, default=cfg.CHUNK_DAYS, help="days per job")
+    parser.add_argument("--store", default=getattr(cfg, "STORE_DIR", None),
+                        help="also write to this Parquet route store (default: STORE_DIR)")
+    args = parser.parse_args()
+
+    upstream_names = list(cfg.UPSTREAMS)
+    upstream_asns = [str(cfg.UPSTREAMS[name]) for name in upstream_names]
+    extra_params = {"collectors": cfg.COLLECTORS} if cfg.COLLECTORS is not None else None
+    windows = day_windows(args.first_day, args.last_day)
+    chunks = chunk_windows(windows, max(1, args.chunk_days))
+    store = None
+    if args.store:
+        from route_store import RouteStore
+        store = RouteStore(args.store)
+
+    # {date string: {(prefix, upstream name): presence entry, or None after a failure}}
+    results = {day.strftime('%Y-%m-%d'): {} for day, _, _ in windows}
+    failures = []
+    started = time.perf_counter()
+
+    # Jobs are submitted and collected prefix by prefix, day run by day run, so output
+    # order is fixed regardless of which worker finishes first
+    processes = max(1, args.processes)
+    with ProcessPoolExecutor(max_workers=processes, initializer=init_worker,
+                             initargs=(REQUESTS_PER_SECOND / processes, BURST / processes)) as pool:
+        jobs = [pool.submit(replay_job, prefix, str(origin), upstream_asns, chunk, extra_params, store is not None)
+                for prefix, origin in cfg.PREFIXES.items() for chunk in chunks]
+        for n, job in enumerate(jobs, 1):
+            prefix, days, error = job.result()
+            origin = cfg.PREFIXES[prefix]
+            if error:
+                failures.append((prefix, days[0][0], days[-1][0], error))
+            for day_str, presence in days:
+                for name, asn in zip(upstream_names, upstream_asns):
+                    results[day_str][(prefix, name)] = presence[asn] if presence else None
+                if store is not None and presence:
+                    store.add_day(day_str, prefix, origin, presence, dict(zip(upstream_asns, upstream_names)))
+            print(f"[{n}/{len(jobs)}] {prefix} {days[0][0]}..{days[-1][0]} {'FAILED' if error else 'ok'}")
+    if store is not None:
+        store.flush()
+    elapsed = time.perf_counter() - started
+
+    # Same wide table as batch_audit.py: a row per day, a column per (prefix, upstream)
+    os.makedirs(cfg.CSV_DIR, exist_ok=True)
+    csv_filename = os.path.join(cfg.CSV_DIR, f"audit_{args.first_day}_to_{args.last_day}.csv")
+    columns = [(prefix, name) for prefix in cfg.PREFIXES for name in upstream_names]
+    with open(csv_filename, mode="w", newline="") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["Date"] + [f"{prefix} {name}_upstream" for prefix, name in columns])
+        for day_str, row in results.items():
+            cells = []
+            for col in columns:
+                p = row.get(col)
+                cells.append("Error" if p is None else "Yes" if p["seen"] else "No")
+            writer.writerow([day_str] + cells)
+
+    n_days = len(windows) * len(cfg.PREFIXES)
+    print(f"Saved {csv_filename}: {n_days} prefix-days in {elapsed:.1f}s on {args.processes} processes")
+    if failures:
+        print(f"{len(failures)} job(s) failed:")
+        for prefix, first, last, error in failures:
+            print(f"--- {prefix} {first}..{last}\n{error}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Batch route audit: every prefix against every watched upstream in one run.
+
+Reads the prefixes, upstream ASNs and date range from audit_config.py (see
+audit_config.py.example). Each prefix's BGPlay data is fetched once for the
+whole range and every upstream is evaluated in the same replay pass. The
+result is a single wide CSV with one row per day and one Yes/No column per
+(prefix, upstream) pair. With STORE_DIR set, per-day dwell metrics and
+presence intervals also go to the Parquet route store (see route_store.py).
+"""
+import csv
+import os
+
+import audit_config as cfg
+from bgplay_fetch import day_windows, fetch_days
+from bgplay_replay import PathTable, ReplayState, parse_bgplay, upstream_presence, upstreams_seen
+from ripestat_cache import default_cache
+from ripestat_client import default_client
+
+upstream_names = list(cfg.UPSTREAMS)
+upstream_asns = [str(cfg.UPSTREAMS[name]) for name in upstream_names]
+extra_params = {"collectors": cfg.COLLECTORS} if cfg.COLLECTORS is not None else None
+windows = day_windows(cfg.FIRST_DAY, cfg.LAST_DAY)
+
+# Optional columnar history store (needs pyarrow); older configs may not set STORE_DIR
+store_dir = getattr(cfg, "STORE_DIR", None)
+if store_dir:
+    from route_store import RouteStore
+    store = RouteStore(store_dir)
+    asn_names = dict(zip(upstream_asns, upstream_names))
+
+# {date string: {(prefix, upstream name): True/False}}
+results = {day.strftime('%Y-%m-%d'): {} for day, _, _ in windows}
+
+for prefix, origin in cfg.PREFIXES.items():
+    # One path table per prefix so paths are interned once for the whole range
+    table = PathTable(origin, upstream_asns)
+    days = fetch_days(prefix, windows, extra_params=extra_params,
+                      max_workers=cfg.MAX_WORKERS, chunk_days=cfg.CHUNK_DAYS)
+    for current_day, day_start, day_end, data in days:
+        initial_state, events = parse_bgplay(data)
+
+        # Replay the day once for all watched upstreams
+        state = ReplayState(origin, upstream_asns, table)
+        state.load(initial_state)
+        if store_dir:
+            # The store needs the full-day sweep (dwell and intervals), not just the first sighting
+            presence = upstream_presence(state, events, int(day_start.timestamp()), int(day_end.timestamp()),
+                                         with_intervals=True, with_churn=True)
+            store.add_day(current_day, prefix, origin, presence, asn_names)
+            seen = {asn: p["seen"] for asn, p in presence.items()}
+        else:
+            seen = upstreams_seen(state, events, int(day_start.timestamp()), int(day_end.timestamp()))
+
+        day_str = current_day.strftime('%Y-%m-%d')
+        for name, asn in zip(upstream_names, upstream_asns):
+            results[day_str][(prefix, name)] = seen[asn]
+
+        summary = " | ".join(f"{name}: {'Yes' if seen[asn] else 'No'}" for name, asn in zip(upstream_names, upstream_asns))
+        print(f"{day_str} | {prefix} | {summary}")
+
+    if store_dir:
+        store.flush()
+
+# Write one wide table: a row per day, a column per (prefix, upstream)
+os.makedirs(cfg.CSV_DIR, exist_ok=True)
+csv_filename = os.path.join(cfg.CSV_DIR, f"audit_{cfg.FIRST_DAY}_to_{cfg.LAST_DAY}.csv")
+columns = [(prefix, name) for prefix in cfg.PREFIXES for name in upstream_names]
+with open(csv_filename, mode="w", newline="") as csvfile:
+    writer = csv.writer(csvfile)
+    writer.writerow(["Date"] + [f"{prefix} {name}_upstream" for prefix, name in columns])
+    for day_str, row in results.items():
+        writer.writerow([day_str] + ["Yes" if row.get(col) else "No" for col in columns])
+
+print(f"Saved {csv_filename}")
+
+# Report how much of the run was served from the on-disk cache, and how the network requests went
+print(default_cache().summary())
+print(default_client().summary())
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark of the BGPlay replay loops.
+
+Generates deterministic BGPlay-shaped payloads with bgp_synth and times the
+legacy rebuild-per-timestamp loops from the original scripts against the
+replay engines, reporting events/sec and peak RSS. Every case runs in a fresh
+process so peak memory is per engine. No network access is needed.
+
+By default one watched upstream (64496, a documentation ASN) never appears,
+so no engine can stop early and every case walks the whole day. The legacy
+loops match withdrawals by path rather than by peer, so their Yes/No results
+are shown but not cross-checked against the engines.
+
+Examples:
+    python bench_replay.py
+    python bench_replay.py --events 1000 100000 1000000 --engines replay columns stream
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import sys
+import time
+
+import bgp_synth
+from bgplay_columns import day_upstream_presence
+from bgplay_replay import ReplayState, parse_bgplay, upstream_presence, upstreams_seen
+from bgplay_stream import stream_upstreams_seen
+from presence_index import PresenceIndex
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+ENGINES = ["legacy_per_second", "legacy_rebuild", "replay", "presence", "columns", "stream", "index"]
+LEGACY = {"legacy_per_second", "legacy_rebuild"}
+DAY = 86400
+
+
+# === Legacy loops (as in test.py / faster_test_csv.py before the replay engine) ===
+def _legacy_active(initial_state, events, ts):
+    active_paths = []
+    for st in initial_state:
+        path = st.get("path") or st.get("as_path") or []
+        if isinstance(path, list) and path:
+            active_paths.append([str(x) for x in path])
+    for ev in events:
+        ev_ts = int(float(ev.get("timestamp", 0)))
+        if ev_ts > ts:
+            break
+        typ = str(ev.get("type", "")).lower()
+        path = ev.get("path") or ev.get("as_path") or []
+        if isinstance(path, list) and path:
+            path = [str(x) for x in path]
+            if "announce" in typ or typ == "a":
+                active_paths.append(path)
+            elif "withdraw" in typ or typ == "w":
+                try:
+                    active_paths.remove(path)
+                except ValueError:
+                    pass
+    return active_paths
+
+
+def _legacy_check(initial_state, events, timestamps, my_asn, upstreams):
+    seen = dict.fromkeys(upstreams, False)
+    for ts in timestamps:
+        paths_with_my_asn = [p for p in _legacy_active(initial_state, events, ts) if p and p[-1] == my_asn]
+        for asn in upstreams:
+            if any(asn in p[:-1] for p in paths_with_my_asn):
+                seen[asn] = True
+        if all(seen.values()):
+            break
+    return seen
+
+
+def legacy_rebuild(data, my_asn, upstreams, start_ts, end_ts):
+    initial_state, events = _legacy_input(data)
+    timestamps = [start_ts] + [int(ev["timestamp"]) for ev in events if int(ev["timestamp"]) <= end_ts]
+    return _legacy_check(initial_state, events, timestamps, my_asn, upstreams)
+
+
+def legacy_per_second(data, my_asn, upstreams, start_ts, end_ts):
+    initial_state, events = _legacy_input(data)
+    return _legacy_check(initial_state, events, range(start_ts, end_ts + 1), my_asn, upstreams)
+
+
+def _legacy_input(data):
+    # The legacy loops read the path from the top level of each event
+    initial_state, events = parse_bgplay(data)
+    flat = [{"type": ev["type"], "timestamp": ev["timestamp"], "path": ev["attrs"].get("path")} for ev in events]
+    return initial_state, flat
+
+
+# === Replay engines ===
+def run_replay(data, my_asn, upstreams, start_ts, end_ts):
+    initial_state, events = parse_bgplay(data)
+    state = ReplayState(my_asn, upstreams)
+    state.load(initial_state)
+    return upstreams_seen(state, events, start_ts, end_ts)
+
+
+def run_presence(data, my_asn, upstreams, start_ts, end_ts):
+    initial_state, events = parse_bgplay(data)
+    state = ReplayState(my_asn, upstreams)
+    state.load(initial_state)
+    return {asn: p["seen"] for asn, p in upstream_presence(state, events, start_ts, end_ts).items()}
+
+
+def run_columns(data, my_asn, upstreams, start_ts, end_ts):
+    presence = day_upstream_presence(data, my_asn, upstreams, start_ts, end_ts)
+    return {asn: p["seen"] for asn, p in presence.items()}
+
+
+def run_stream(body, my_asn, upstreams, start_ts, end_ts):
+    state = ReplayState(my_asn, upstreams)
+    return stream_upstreams_seen(state, io.BytesIO(body), start_ts, end_ts)
+
+
+def run_index(data, my_asn, upstreams, start_ts, end_ts):
+    index = PresenceIndex.build(data, start_ts, end_ts)
+    return {asn: index.upstream_between(my_asn, asn, start_ts, end_ts) for asn in upstreams}
+
+
+RUNNERS = {
+    "legacy_per_second": legacy_per_second,
+    "legacy_rebuild": legacy_rebuild,
+    "replay": run_replay,
+    "presence": run_presence,
+    "columns": run_columns,
+    "stream": run_stream,
+    "index": run_index,
+}
+
+
+# === Measurement ===
+def peak_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes elsewhere
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_case(engine, n_events, opts, queue):
+    """Runs one engine on one payload size in this (fresh) process."""
+    payload = bgp_synth.generate(events=n_events, peers=opts["peers"], paths=opts["paths"],
+                                 start_ts=opts["start_ts"], duration=DAY, seed=opts["seed"])
+    data = payload["data"]
+    arg = json.dumps(payload).encode() if engine == "stream" else data
+    del payload
+    start_ts = opts["start_ts"]
+    end_ts = start_ts + DAY - 1
+
+    tracing = False
+    if resource is None:
+        import tracemalloc
+        tracemalloc.start()
+        tracing = True
+    rss_before = peak_rss_mb()
+    started = time.perf_counter()
+    result = RUNNERS[engine](arg, str(opts["my_asn"]), [str(a) for a in opts["upstreams"]], start_ts, end_ts)
+    elapsed = time.perf_counter() - started
+    if tracing:
+        peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        rss_after = rss_before = None
+    else:
+        peak = None
+        rss_after = peak_rss_mb()
+    queue.put({"engine": engine, "events": n_events, "seconds": elapsed, "result": result,
+               "rss_mb": rss_after, "rss_growth_mb": (rss_after - rss_before) if rss_after is not None else None,
+               "traced_peak_mb": peak})
+
+
+def measure(engine, n_events, opts):
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=run_case, args=(engine, n_events, opts, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark BGPlay replay loops on synthetic data")
+    parser.add_argument("--events", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=ENGINES)
+    parser.add_argument("--peers", type=int, default=50)
+    parser.add_argument("--paths", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--my-asn", default=str(bgp_synth.MY_ASN))
+    parser.add_argument("--upstreams", nargs="+",
+                        default=[str(bgp_synth.GLO_ASN), str(bgp_synth.DOLPHIN_ASN), "64496"])
+    parser.add_argument("--legacy-max-events", type=int, default=2000,
+                        help="skip legacy_rebuild above this many events (it is O(events^2))")
+    parser.add_argument("--per-second-max-events", type=int, default=100,
+                        help="skip legacy_per_second above this many events (86,400 rebuilds per day)")
+    args = parser.parse_args()
+
+    opts = {"peers": args.peers, "paths": args.paths, "seed": args.seed, "start_ts": 1756684800,
+            "my_asn": args.my_asn, "upstreams": args.upstreams}
+
+    print(f"{'engine':<18} {'events':>9} {'seconds':>9} {'events/sec':>12} {'peak RSS MB':>12} {'RSS growth':>11}  result")
+    for n_events in args.events:
+        reference = None
+        for engine in args.engines:
+            if engine == "legacy_rebuild" and n_events > args.legacy_max_events:
+                continue
+            if engine == "legacy_per_second" and n_events > args.per_second_max_events:
+                continue
+            r = measure(engine, n_events, opts)
+            rate = r["events"] / r["seconds"] if r["seconds"] else float("inf")
+            if r["rss_mb"] is not None:
+                mem = f"{r['rss_mb']:>12.1f} {r['rss_growth_mb']:>11.1f}"
+            else:
+                mem = f"{r['traced_peak_mb']:>12.1f} {'(traced)':>11}"
+            flags = " ".join(f"{asn}={'Y' if v else 'N'}" for asn, v in r["result"].items())
+            # Legacy loops match paths instead of peers, so only the engines are cross-checked
+            if engine not in LEGACY:
+                if reference is None:
+                    reference = r["result"]
+                elif r["result"] != reference:
+                    flags += "  MISMATCH"
+            print(f"{engine:<18} {n_events:>9} {r['seconds']:>9.3f} {rate:>12.0f} {mem}  {flags}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Deterministic generator of BGPlay-shaped payloads for offline testing.
+
+Produces {"data": {"initial_state": [...], "events": [...]}} documents in the
+same shape RIPEstat returns (source_id / target_prefix / path, events with
+"attrs"), with a configurable number of collector peers, pool of AS paths,
+route churn and flapping peers. The same seed always gives the same payload.
+"""
+import random
+
+MY_ASN = 329001
+GLO_ASN = 37148
+DOLPHIN_ASN = 37613
+
+
+def make_paths(rng, count, my_asn=MY_ASN, upstreams=(GLO_ASN, DOLPHIN_ASN), hijack_share=0.02):
+    """Pool of AS paths ending at my_asn, some through the watched upstreams."""
+    paths = []
+    for i in range(count):
+        length = rng.randint(1, 5)
+        hops = [rng.randint(1000, 65000) for _ in range(length)]
+        if upstreams and rng.random() < 0.5:
+            hops.append(upstreams[i % len(upstreams)])
+        origin = my_asn if rng.random() >= hijack_share else rng.randint(1000, 65000)
+        paths.append(hops + [origin])
+    return paths
+
+
+def generate(events=1000, peers=50, paths=200, start_ts=1756684800, duration=86400,
+             prefix="102.217.0.0/22", flap_share=0.1, flap_gap=30, withdraw_share=0.3, seed=1):
+    """
+    Returns a BGPlay-shaped response dict.
+
+    events          number of update events
+    peers           collector peers (source_ids) holding a route at the start
+    paths           size of the AS path pool announcements draw from
+    duration        seconds covered by the events, starting at start_ts
+    flap_share      share of events that are a withdraw followed by a
+                    re-announce of the same path within flap_gap seconds
+    withdraw_share  share of the remaining events that are plain withdrawals
+    """
+    rng = random.Random(seed)
+    pool = make_paths(rng, paths)
+    sources = [f"{i % 25:02d}-10.{i // 250}.{i % 250}.1" for i in range(peers)]
+
+    initial_state = [{"source_id": s, "target_prefix": prefix, "path": rng.choice(pool)} for s in sources]
+    current = {st["source_id"]: st["path"] for st in initial_state}
+
+    out = []
+    while len(out) < events:
+        ts = start_ts + rng.randrange(duration)
+        source = rng.choice(sources)
+        roll = rng.random()
+        if roll < flap_share and len(out) + 2 <= events:
+            path = current.get(source) or rng.choice(pool)
+            out.append(_event("W", ts, source, prefix))
+            out.append(_event("A", ts + rng.randint(1, flap_gap), source, prefix, path))
+        elif roll < flap_share + withdraw_share:
+            out.append(_event("W", ts, source, prefix))
+        else:
+            path = rng.choice(pool)
+            current[source] = path
+            out.append(_event("A", ts, source, prefix, path))
+    out.sort(key=lambda ev: ev["timestamp"])
+    return {"data": {"resource": prefix, "initial_state": initial_state, "events": out[:events]}}
+
+
+def _event(kind, ts, source, prefix, path=None):
+    attrs = {"source_id": source, "target_prefix": prefix}
+    if path is not None:
+        attrs["path"] = list(path)
+    return {"type": kind, "timestamp": ts, "attrs": attrs}
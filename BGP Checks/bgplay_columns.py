@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+NumPy columnar event store for BGPlay data.
+
+A day (or month) of BGPlay events is loaded into parallel arrays: int64
+timestamps, int32 path IDs (from a shared PathTable), an int8 announce/withdraw
+flag and an int32 peer ID. Upstream presence, dwell time and change counts are
+then computed with vectorised operations: for every event the path it replaces
+on its peer is found with a grouped shift, each event becomes a per-upstream
++1/-1 delta, and a cumulative sum gives the number of active paths through
+each upstream after every event.
+
+numpy is optional (pip install numpy). Without it, or for responses whose
+entries carry no source_id, day_upstream_presence() falls back to the
+ReplayState sweep, which gives the same answer.
+"""
+from bgplay_replay import (PathTable, ReplayState, event_kind, event_ts, parse_bgplay, raw_path,
+                           route_key, upstream_presence)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class EventColumns:
+    def __init__(self, ts, kind, pid, peer, initial_pid, peer_source):
+        self.ts = ts                    # int64, sorted
+        self.kind = kind                # int8: 1 announce, -1 withdraw
+        self.pid = pid                  # int32 path ID, -1 for withdrawals without a path
+        self.peer = peer                # int32 peer ID ((source_id, prefix) route key)
+        self.initial_pid = initial_pid  # int32 per peer ID, -1 if the peer had no route
+        self.peer_source = peer_source  # int32 per peer ID: collector peer (source_id) number
+
+    @classmethod
+    def from_bgplay(cls, data, table):
+        """
+        Builds the columns from a BGPlay "data" dict, interning paths in table.
+
+        Raises ValueError when an entry has no source_id, since replacing a
+        peer's route needs the peer.
+        """
+        initial_state, events = parse_bgplay(data)
+        peers = {}
+        sources = {}
+        peer_source = []
+
+        def peer_id(item):
+            key = route_key(item)
+            if key is None:
+                raise ValueError("BGPlay entry without source_id; columnar replay needs peer keys")
+            p = peers.get(key)
+            if p is None:
+                p = peers[key] = len(peers)
+                peer_source.append(sources.setdefault(key[0], len(sources)))
+            return p
+
+        initial = {}
+        for st in initial_state:
+            path = raw_path(st)
+            if path:
+                initial[peer_id(st)] = table.intern(path)
+
+        ts, kind, pid, peer = [], [], [], []
+        for ev in events:
+            k = event_kind(ev)
+            path = raw_path(ev)
+            if k is None or (k == "A" and not path):
+                continue
+            ts.append(event_ts(ev))
+            kind.append(1 if k == "A" else -1)
+            pid.append(table.intern(path) if path else -1)
+            peer.append(peer_id(ev))
+
+        initial_pid = np.full(len(peers), -1, dtype=np.int32)
+        for p, path_id in initial.items():
+            initial_pid[p] = path_id
+        return cls(np.array(ts, dtype=np.int64), np.array(kind, dtype=np.int8),
+                   np.array(pid, dtype=np.int32), np.array(peer, dtype=np.int32), initial_pid,
+                   np.array(peer_source, dtype=np.int32))
+
+    def upstream_counts(self, table, n_up):
+        """
+        (initial counts, counts after each event) for every watched upstream.
+
+        Both are int64 arrays with one row per upstream bit.
+        """
+        # Mask per path ID; index -1 (no path) picks the trailing 0
+        masks = np.array(table.masks + [0], dtype=np.int64)
+        n = len(self.ts)
+
+        # Path each peer holds after the event, and the one it held before
+        after = np.where(self.kind == 1, self.pid, -1)
+        order = np.lexsort((np.arange(n), self.peer))
+        peer_sorted = self.peer[order]
+        before_sorted = np.empty(n, dtype=np.int32)
+        if n:
+            before_sorted[1:] = after[order][:-1]
+            first = np.ones(n, dtype=bool)
+            first[1:] = peer_sorted[1:] != peer_sorted[:-1]
+            before_sorted[first] = self.initial_pid[peer_sorted[first]]
+        before = np.empty(n, dtype=np.int32)
+        before[order] = before_sorted
+
+        m_after = masks[after]
+        m_before = masks[before]
+        m_initial = masks[self.initial_pid]
+        initial = np.empty(n_up, dtype=np.int64)
+        counts = np.empty((n_up, n), dtype=np.int64)
+        for b in range(n_up):
+            initial[b] = ((m_initial >> b) & 1).sum()
+            delta = ((m_after >> b) & 1) - ((m_before >> b) & 1)
+            counts[b] = initial[b] + np.cumsum(delta)
+        return initial, counts
+
+    def presence(self, table, upstreams, start_ts, end_ts, with_intervals=False):
+        """
+        {upstream ASN: {"seen", "dwell_seconds", "changes", "peer_share"}} over [start_ts, end_ts],
+        matching bgplay_replay.upstream_presence(), including its "intervals" with with_intervals=True.
+        """
+        n_up = len(upstreams)
+        initial, counts = self.upstream_counts(table, n_up)
+        ts = self.ts
+        k0 = np.searchsorted(ts, start_ts, side="right")
+        k1 = np.searchsorted(ts, end_ts, side="right")
+        start_counts = counts[:, k0 - 1] if k0 else initial
+
+        # Boundary = last event of each distinct timestamp inside the window
+        last = np.ones(len(ts), dtype=bool)
+        last[:-1] = ts[1:] != ts[:-1]
+        idx = np.nonzero(last[k0:k1])[0] + k0
+        seg_start = np.concatenate(([start_ts], ts[idx]))
+        seg_end = np.concatenate((ts[idx], [end_ts + 1]))
+        present = np.column_stack((start_counts, counts[:, idx])) > 0
+
+        seen = present.any(axis=1)
+        dwell = (present * (seg_end - seg_start)).sum(axis=1)
+        changes = (present[:, 1:] != present[:, :-1]).sum(axis=1)
+        shares = self.peer_shares(table, n_up, k0, k1)
+        presence = {str(asn): {"seen": bool(seen[i]), "dwell_seconds": int(dwell[i]), "changes": int(changes[i]),
+                               "peer_share": shares[i]}
+                    for i, asn in enumerate(upstreams)}
+        if with_intervals:
+            # Runs of present segments: +1 where a run opens, -1 one past where it closes
+            edges = np.diff(np.pad(present.astype(np.int8), ((0, 0), (1, 1))), axis=1)
+            for i, asn in enumerate(upstreams):
+                opens = np.flatnonzero(edges[i] == 1)
+                closes = np.flatnonzero(edges[i] == -1) - 1
+                presence[str(asn)]["intervals"] = list(zip(seg_start[opens].tolist(), seg_end[closes].tolist()))
+        return presence
+
+    def peer_shares(self, table, n_up, k0, k1):
+        """
+        Fraction of collector peers with a route in the window (held at its
+        start or announced inside it) that carried a my_asn path through each
+        upstream. Events [0, k0) lead up to the window start, [k0, k1) fall
+        inside it.
+        """
+        src = self.peer_source
+        masks = np.array(table.masks + [0], dtype=np.int64)
+        after = np.where(self.kind == 1, self.pid, -1)
+
+        # Route each peer holds at the window start: its last update before it, else its initial route
+        start_pid = self.initial_pid.copy()
+        if k0:
+            peers_rev = self.peer[:k0][::-1]
+            uniq, first_rev = np.unique(peers_rev, return_index=True)
+            start_pid[uniq] = after[k0 - 1 - first_rev]
+
+        in_window = self.peer[k0:k1]
+        announced = self.kind[k0:k1] == 1
+        active_peers = np.union1d(src[np.nonzero(start_pid >= 0)[0]], src[in_window[announced]])
+        if not len(active_peers):
+            return [0.0] * n_up
+
+        m_start = masks[start_pid]
+        m_window = masks[after[k0:k1]]
+        shares = []
+        for b in range(n_up):
+            carried = np.union1d(src[np.nonzero((m_start >> b) & 1)[0]], src[in_window[((m_window >> b) & 1) == 1]])
+            shares.append(len(carried) / len(active_peers))
+        return shares
+
+
+def day_upstream_presence(data, my_asn, upstreams, start_ts, end_ts, table=None, with_intervals=False):
+    """
+    {upstream ASN: {"seen", "dwell_seconds", "changes", "peer_share"}} for one BGPlay window,
+    plus the presence "intervals" with with_intervals=True.
+
+    Uses the columnar store when numpy is available and every entry carries a
+    peer key, otherwise the ReplayState sweep. Pass a PathTable to reuse
+    interned paths across days.
+    """
+    table = table or PathTable(my_asn, upstreams)
+    if np is not None:
+        try:
+            cols = EventColumns.from_bgplay(data, table)
+        except ValueError:
+            cols = None
+        if cols is not None:
+            return cols.presence(table, [str(asn) for asn in upstreams], start_ts, end_ts, with_intervals)
+
+    initial_state, events = parse_bgplay(data)
+    state = ReplayState(my_asn, upstreams, table)
+    state.load(initial_state)
+    return upstream_presence(state, events, start_ts, end_ts, with_intervals)
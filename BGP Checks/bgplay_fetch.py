@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Concurrent multi-day BGPlay fetcher.
+
+Downloads the per-day BGPlay windows of a date range with a bounded worker
+pool and hands them back strictly in date order, so the existing per-day
+evaluation loops stay unchanged while the round trips overlap.
+
+With chunk_days > 1 each request covers several days at once and the wide
+window is split into per-day slices locally, which cuts the request count
+and avoids downloading a fresh initial_state for every day.
+
+With stream=True each day is handed over as an open file with the raw
+response body instead of a decoded dict, for incremental parsing with
+bgplay_stream.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+from bgplay_replay import split_days
+from ripestat_cache import default_cache
+from ripestat_client import default_client
+from ripestat_urls import data_url
+
+BGPLAY_URL = data_url("bgplay")
+
+# Concurrent downloads; the request rate itself is limited by ripestat_client
+MAX_WORKERS = 4
+
+# Wide-window mode: days per BGPlay query, and the event count above which a
+# multi-day response is considered too large and re-fetched in halves (as is
+# one that fails with an HTTP error or times out)
+CHUNK_DAYS = 1
+MAX_CHUNK_EVENTS = 200000
+
+# Retries of a timed-out or 5xx multi-day query before it is split (single days get the client's full retries)
+CHUNK_MAX_RETRIES = 0
+
+# Read size when streaming a BGPlay body to disk
+STREAM_CHUNK_BYTES = 1024 * 1024
+
+
+def day_windows(first_day_str, last_day_str):
+    """[(day, day_start, day_end), ...] for every UTC day in the inclusive range."""
+    first_day = datetime.fromisoformat(first_day_str).replace(tzinfo=timezone.utc)
+    last_day = datetime.fromisoformat(last_day_str).replace(tzinfo=timezone.utc)
+    windows = []
+    current_day = first_day
+    while current_day.date() <= last_day.date():
+        day_start = current_day.replace(hour=0, minute=0, second=0)
+        day_end = current_day.replace(hour=23, minute=59, second=59)
+        windows.append((current_day, day_start, day_end))
+        current_day += timedelta(days=1)
+    return windows
+
+
+def bgplay_params(prefix, start, end, extra_params=None):
+    params = {
+        "resource": prefix,
+        "starttime": start.isoformat(),
+        "endtime": end.isoformat(),
+        "unix_timestamps": "true"
+    }
+    if extra_params:
+        params.update(extra_params)
+    return params
+
+
+class _TooLarge(Exception):
+    """Raised by fetch_bgplay() for a response over max_events events, before it is cached."""
+
+
+def fetch_bgplay(prefix, start, end, extra_params=None, client=None, cache=None, max_events=None,
+                 max_retries=None):
+    """
+    Fetches one BGPlay window and returns its "data" dict.
+
+    Closed windows are served from the on-disk RIPEstat cache when possible;
+    the client's rate limit and retries only apply to real network requests.
+    A response with more than max_events events raises _TooLarge and is not
+    cached; max_retries overrides the client's retry limit for this query.
+    """
+    params = bgplay_params(prefix, start, end, extra_params)
+    client = client or default_client()
+
+    def fetch():
+        response = client.get_json(BGPLAY_URL, params, max_retries=max_retries)
+        if max_events is not None and len(response.get("data", {}).get("events") or []) > max_events:
+            raise _TooLarge()
+        return response
+
+    cache = cache or default_cache()
+    return cache.get_json(BGPLAY_URL, params, fetch).get("data", {})
+
+
+def fetch_bgplay_stream(prefix, start, end, extra_params=None, client=None, cache=None):
+    """
+    Fetches one BGPlay window without decoding it.
+
+    Returns an open binary file positioned at the start of the raw JSON body;
+    the body is streamed to disk (the cache, or a temporary file for windows
+    that are not closed yet) rather than held in memory.
+    """
+    params = bgplay_params(prefix, start, end, extra_params)
+    client = client or default_client()
+
+    def download(f):
+        with client.get(BGPLAY_URL, params, stream=True) as resp:
+            for chunk in resp.iter_content(chunk_size=STREAM_CHUNK_BYTES):
+                f.write(chunk)
+
+    cache = cache or default_cache()
+    return cache.open_stream(BGPLAY_URL, params, download)
+
+
+def chunk_windows(windows, chunk_days):
+    """
+    Groups day windows into runs of at most chunk_days consecutive days.
+
+    A gap (e.g. days skipped because they were already done) always starts a
+    new group, so a wide query never spans days that were not asked for.
+    """
+    chunks = []
+    for window in windows:
+        if (chunks and len(chunks[-1]) < chunk_days
+                and (window[1] - chunks[-1][-1][2]).total_seconds() <= 1):
+            chunks[-1].append(window)
+        else:
+            chunks.append([window])
+    return chunks
+
+
+def fetch_chunk(prefix, chunk, extra_params=None, client=None, max_events=MAX_CHUNK_EVENTS):
+    """
+    Fetches consecutive day windows as one BGPlay query and splits it per day.
+
+    If the combined response holds more than max_events events, or the
+    query fails with an HTTP error or times out, the chunk is halved and each
+    half fetched separately, down to single days. Oversized responses are
+    kept out of the cache. Returns [(day, day_start, day_end, data), ...] in
+    date order.
+    """
+    if len(chunk) == 1:
+        day, day_start, day_end = chunk[0]
+        return [(day, day_start, day_end, fetch_bgplay(prefix, day_start, day_end, extra_params, client))]
+    try:
+        data = fetch_bgplay(prefix, chunk[0][1], chunk[-1][2], extra_params, client, max_events=max_events,
+                            max_retries=CHUNK_MAX_RETRIES)
+    except (_TooLarge, requests.HTTPError, requests.Timeout):
+        mid = len(chunk) // 2
+        return (fetch_chunk(prefix, chunk[:mid], extra_params, client, max_events)
+                + fetch_chunk(prefix, chunk[mid:], extra_params, client, max_events))
+    return split_days(data, chunk)
+
+
+def fetch_days(prefix, windows, extra_params=None, max_workers=MAX_WORKERS, client=None,
+               chunk_days=CHUNK_DAYS, max_events=MAX_CHUNK_EVENTS, stream=False):
+    """
+    Yields (day, day_start, day_end, data) for each window, in the given order.
+
+    Windows are grouped into queries of up to chunk_days consecutive days. At most
+    max_workers downloads run at once, and only a small number of finished
+    queries are held in memory ahead of the consumer.
+
+    With stream=True every day is queried on its own and data is an open
+    binary file with the raw body (see fetch_bgplay_stream); close it after use.
+    """
+    windows = list(windows)
+    chunk_days = 1 if stream else max(1, chunk_days)
+    chunks = chunk_windows(windows, chunk_days)
+    client = client or default_client()
+
+    def fetch(chunk):
+        if stream:
+            day, day_start, day_end = chunk[0]
+            return [(day, day_start, day_end, fetch_bgplay_stream(prefix, day_start, day_end, extra_params, client))]
+        return fetch_chunk(prefix, chunk, extra_params, client, max_events)
+    ahead = max(1, max_workers) * 2
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        pending = []
+        chunks = iter(chunks)
+
+        def submit_next():
+            for chunk in chunks:
+                pending.append(pool.submit(fetch, chunk))
+                return
+
+        for _ in range(ahead):
+            submit_next()
+        while pending:
+            days = pending.pop(0).result()
+            submit_next()
+            yield from days
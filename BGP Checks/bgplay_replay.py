@@ -0,0 +1,692 @@
+#!/usr/bin/env python3
+"""
+Incremental BGPlay replay engine.
+
+The daily checks used to rebuild the active path list from initial_state and
+re-apply every event for each timestamp they looked at. This module walks the
+time-sorted events once and keeps the active RIB up to date as it goes, so a
+whole day costs a single pass over its events.
+"""
+from datetime import datetime, timezone
+
+# A withdrawal followed by a re-announcement from the same peer within this
+# many seconds counts as a flap
+FLAP_SECONDS = 300
+
+
+def event_ts(ev):
+    """
+    Event timestamp as whole seconds. BGPlay may return floats or numeric
+    strings; other RIPEstat calls (bgp-updates) use ISO 8601 UTC strings.
+    """
+    value = ev.get("timestamp", 0)
+    try:
+        return int(float(value))
+    except ValueError:
+        dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return int(dt.timestamp())
+
+
+def event_kind(ev):
+    """Returns 'A' for announcements, 'W' for withdrawals, None otherwise."""
+    typ = str(ev.get("type", "")).lower()
+    if "announce" in typ or typ == "a":
+        return "A"
+    if "withdraw" in typ or typ == "w":
+        return "W"
+    return None
+
+
+def path_of(item):
+    """
+    AS path of an initial_state entry or event as a tuple of ASN strings.
+
+    BGPlay nests event details under "attrs"; flat entries are accepted too.
+    Returns None when the entry carries no usable path.
+    """
+    attrs = item.get("attrs") or item
+    path = attrs.get("path") or attrs.get("as_path") or []
+    if isinstance(path, list) and path:
+        return tuple(str(x) for x in path)
+    return None
+
+
+def raw_path(item):
+    """
+    AS path of an initial_state entry or event as BGPlay sent it (a tuple),
+    without per-ASN conversion; None when the entry carries no usable path.
+    """
+    attrs = item.get("attrs") or item
+    path = attrs.get("path") or attrs.get("as_path") or []
+    if isinstance(path, list) and path:
+        return tuple(path)
+    return None
+
+
+def route_key(item):
+    """
+    (source_id, target_prefix) of an initial_state entry or event.
+
+    BGPlay's source_id names the collector and peer ("00-195.66.224.175"),
+    so the key identifies one peer's route for one prefix. Returns None for
+    entries without a source_id.
+    """
+    attrs = item.get("attrs") or item
+    source = attrs.get("source_id")
+    if source is None:
+        return None
+    return str(source), str(attrs.get("target_prefix") or "")
+
+
+def parse_bgplay(data):
+    """Splits a BGPlay "data" dict into (initial_state, time-sorted events)."""
+    initial_state = data.get("initial_state", []) or []
+    events = sorted(data.get("events", []) or [], key=event_ts)
+    return initial_state, events
+
+
+def asn_int(x):
+    """ASN as an int where possible (AS_SET members and oddities stay strings)."""
+    try:
+        return int(x)
+    except (TypeError, ValueError):
+        return str(x)
+
+
+class PathTable:
+    """
+    Interned AS paths for the replay hot loop.
+
+    Every distinct path is converted once to a tuple of int ASNs and given a
+    small integer ID. Each ID carries a precomputed bitmask of the watched
+    upstreams it passes through (zero unless my_asn is the origin), so the
+    upstream checks become integer operations instead of list scans.
+    """
+
+    def __init__(self, my_asn, upstreams):
+        self.my_asn = asn_int(my_asn)
+        self.upstreams = [asn_int(asn) for asn in upstreams]
+        self.bits = {asn: 1 << i for i, asn in enumerate(self.upstreams)}
+        self.ids = {}      # raw or converted path tuple -> path ID
+        self.paths = []    # path ID -> tuple of ASNs
+        self.masks = []    # path ID -> watched upstream bitmask
+
+    def intern(self, raw_path):
+        key = tuple(raw_path)
+        pid = self.ids.get(key)
+        if pid is not None:
+            return pid
+        path = tuple(asn_int(x) for x in key)
+        pid = self.ids.get(path)
+        if pid is None:
+            pid = len(self.paths)
+            mask = 0
+            if path[-1] == self.my_asn:
+                for asn in path[:-1]:
+                    mask |= self.bits.get(asn, 0)
+            self.paths.append(path)
+            self.masks.append(mask)
+            self.ids[path] = pid
+        self.ids[key] = pid
+        return pid
+
+
+class Rib:
+    """
+    Active routes keyed by (collector peer, prefix).
+
+    A peer holds at most one route per prefix: an announcement replaces the
+    peer's previous route and a withdrawal removes it, whatever path (if any)
+    the withdrawal carries. Both are O(1). Entries without a source_id cannot
+    be attributed to a peer and fall back to matching on the path itself.
+    """
+
+    def __init__(self):
+        self.routes = {}      # (source_id, target_prefix) -> value
+        self.anonymous = {}   # path -> [value, ...] for entries without a key
+
+    def update(self, kind, key, path, value=None):
+        """
+        Applies one announcement ("A") or withdrawal ("W").
+
+        value is what the RIB stores for the route (the path itself by
+        default). Returns (removed, added): the value that stopped being
+        active and the value that became active, None for either if nothing
+        changed on that side.
+        """
+        if value is None:
+            value = path
+        if key is not None:
+            if kind == "A":
+                if path is None:
+                    return None, None
+                old = self.routes.get(key)
+                if old == value:
+                    return None, None
+                self.routes[key] = value
+                return old, value
+            if kind == "W":
+                return self.routes.pop(key, None), None
+            return None, None
+
+        if path is None:
+            return None, None
+        if kind == "A":
+            self.anonymous.setdefault(path, []).append(value)
+            return None, value
+        if kind == "W":
+            stack = self.anonymous.get(path)
+            if stack:
+                old = stack.pop()
+                if not stack:
+                    del self.anonymous[path]
+                return old, None
+        return None, None
+
+    def values(self):
+        """Every active value, once per route."""
+        yield from self.routes.values()
+        for stack in self.anonymous.values():
+            yield from stack
+
+
+class ReplayState:
+    """
+    Active RIB of a BGPlay replay.
+
+    Routes are held per (collector peer, prefix) in a Rib as interned path
+    IDs, with a count of active routes per path ID. Alongside that it keeps,
+    for each watched upstream, how many active routes originated by my_asn
+    pass through it, plus a bitmask of upstreams with a non-zero count, so
+    the upstream flags are available after every update without scanning
+    the RIB.
+    """
+
+    def __init__(self, my_asn, upstreams, table=None):
+        self.my_asn = str(my_asn)
+        self.upstreams = [str(asn) for asn in upstreams]
+        self.table = table or PathTable(my_asn, upstreams)
+        self.rib = Rib()
+        self.counts = {}
+        self.upstream_counts = [0] * len(self.upstreams)
+        self.mask = 0
+        self.full_mask = (1 << len(self.upstreams)) - 1
+        # Peer visibility, only recorded after track_visibility()
+        self.peers_seen = None
+        self.upstream_peers = None
+
+    def load(self, initial_state):
+        for st in initial_state:
+            self.announce(raw_path(st), route_key(st))
+
+    def announce(self, path, key=None):
+        self.apply_record("A", path, key)
+
+    def withdraw(self, path=None, key=None):
+        self.apply_record("W", path, key)
+
+    def apply(self, ev):
+        self.apply_record(event_kind(ev), raw_path(ev), route_key(ev))
+
+    def apply_record(self, kind, path, key=None):
+        pid = self.table.intern(path) if path else None
+        removed, added = self.rib.update(kind, key, pid)
+        if removed is not None:
+            self._remove(removed)
+        if added is not None:
+            self._add(added)
+            if key is not None and self.upstream_peers is not None:
+                self._note_peer(key, added)
+
+    def track_visibility(self):
+        """
+        Starts recording which collector peers carry each watched upstream,
+        seeded with the routes active right now.
+        """
+        self.peers_seen = set()
+        self.upstream_peers = [set() for _ in self.upstreams]
+        for key, pid in self.rib.routes.items():
+            self._note_peer(key, pid)
+
+    def _note_peer(self, key, pid):
+        peer = key[0]
+        self.peers_seen.add(peer)
+        mask = self.table.masks[pid]
+        i = 0
+        while mask:
+            if mask & 1:
+                self.upstream_peers[i].add(peer)
+            mask >>= 1
+            i += 1
+
+    def _add(self, pid):
+        self.counts[pid] = self.counts.get(pid, 0) + 1
+        mask = self.table.masks[pid]
+        if mask:
+            self._track(mask, 1)
+
+    def _remove(self, pid):
+        count = self.counts[pid]
+        if count == 1:
+            del self.counts[pid]
+        else:
+            self.counts[pid] = count - 1
+        mask = self.table.masks[pid]
+        if mask:
+            self._track(mask, -1)
+
+    def flags(self):
+        """{upstream ASN: True if any active my_asn path goes through it}."""
+        return self.mask_flags(self.mask)
+
+    def mask_flags(self, mask):
+        return {asn: bool(mask & (1 << i)) for i, asn in enumerate(self.upstreams)}
+
+    def origin_paths(self):
+        """Active paths (with multiplicity) whose origin is my_asn, as ASN strings."""
+        origin = self.table.my_asn
+        paths = self.table.paths
+        return [tuple(str(x) for x in paths[pid]) for pid, n in self.counts.items()
+                if paths[pid][-1] == origin for _ in range(n)]
+
+    def _track(self, mask, delta):
+        counts = self.upstream_counts
+        i = 0
+        while mask:
+            if mask & 1:
+                counts[i] += delta
+                bit = 1 << i
+                if counts[i]:
+                    self.mask |= bit
+                else:
+                    self.mask &= ~bit
+            mask >>= 1
+            i += 1
+
+
+def event_records(events):
+    """Compact (ts, kind, path, route key) records for a list of BGPlay event dicts."""
+    for ev in events:
+        yield event_ts(ev), event_kind(ev), raw_path(ev), route_key(ev)
+
+
+def sweep_masks(state, records, start_ts, end_ts=None):
+    """
+    Replays time-sorted (ts, kind, path, key) records into state and yields
+    (ts, upstream bitmask) at every boundary.
+
+    The first boundary is start_ts, with every record at or before it applied.
+    After that one boundary is yielded per distinct timestamp, once all
+    records sharing that timestamp are applied. Records after end_ts are ignored.
+    """
+    apply_record = state.apply_record
+    records = iter(records)
+    pending = next(records, None)
+    while pending is not None and pending[0] <= start_ts:
+        apply_record(pending[1], pending[2], pending[3])
+        pending = next(records, None)
+    yield start_ts, state.mask
+
+    while pending is not None:
+        ts = pending[0]
+        if end_ts is not None and ts > end_ts:
+            break
+        while pending is not None and pending[0] == ts:
+            apply_record(pending[1], pending[2], pending[3])
+            pending = next(records, None)
+        yield ts, state.mask
+
+
+def sweep_records(state, records, start_ts, end_ts=None):
+    """sweep_masks() with the bitmask expanded to {upstream ASN: bool} flags."""
+    for ts, mask in sweep_masks(state, records, start_ts, end_ts):
+        yield ts, state.mask_flags(mask)
+
+
+def sweep(state, events, start_ts, end_ts=None):
+    """sweep_records() over a sorted list of BGPlay event dicts."""
+    return sweep_records(state, event_records(events), start_ts, end_ts)
+
+
+def upstreams_seen_records(state, records, start_ts, end_ts=None):
+    """
+    {upstream ASN: True if it carried a my_asn path at any boundary}.
+
+    Stops replaying as soon as every watched upstream has been seen.
+    """
+    seen = 0
+    for _, mask in sweep_masks(state, records, start_ts, end_ts):
+        seen |= mask
+        if seen == state.full_mask:
+            break
+    return state.mask_flags(seen)
+
+
+def upstreams_seen(state, events, start_ts, end_ts=None):
+    """upstreams_seen_records() over a sorted list of BGPlay event dicts."""
+    return upstreams_seen_records(state, event_records(events), start_ts, end_ts)
+
+
+class ChurnStats:
+    """
+    Per-upstream, per-hour update counters collected during a sweep.
+
+    observe() wraps the record stream handed to sweep_masks(): each record is
+    inspected right before the sweep applies it, while the RIB still holds
+    the peer's previous route, so the counts come from the same single pass
+    as the upstream flags. For every watched upstream and hour of the window
+    it counts announcements and withdrawals of my_asn routes through the
+    upstream, path changes (a peer replacing such a route with a different
+    path) and flaps (a peer withdrawing such a route and announcing one
+    through the same upstream again within flap_seconds).
+    """
+
+    FIELDS = ("announcements", "withdrawals", "path_changes", "flaps")
+
+    def __init__(self, state, start_ts, end_ts, flap_seconds=FLAP_SECONDS):
+        self.state = state
+        self.start_ts = start_ts
+        self.end_ts = end_ts
+        self.flap_seconds = flap_seconds
+        n_hours = max(1, (end_ts - start_ts) // 3600 + 1)
+        self.counts = {field: [[0] * n_hours for _ in state.upstreams] for field in self.FIELDS}
+        # {(route key, upstream index): ts of the last withdrawal through that upstream}
+        self.withdrawn = {}
+
+    def observe(self, records):
+        for record in records:
+            ts, kind, path, key = record
+            if self.start_ts <= ts <= self.end_ts and key is not None and kind is not None:
+                self._count(ts, kind, path, key)
+            yield record
+
+    def _count(self, ts, kind, path, key):
+        table = self.state.table
+        masks = table.masks
+        old = self.state.rib.routes.get(key)
+        old_mask = masks[old] if old is not None else 0
+        hour = (ts - self.start_ts) // 3600
+        if kind == "A":
+            if not path:
+                return
+            new = table.intern(path)
+            new_mask = masks[new]
+            self._add("announcements", new_mask, hour)
+            if old is not None and old != new:
+                self._add("path_changes", old_mask | new_mask, hour)
+            i = 0
+            mask = new_mask
+            while mask:
+                if mask & 1:
+                    withdrawn_at = self.withdrawn.pop((key, i), None)
+                    if withdrawn_at is not None and ts - withdrawn_at <= self.flap_seconds:
+                        self.counts["flaps"][i][hour] += 1
+                mask >>= 1
+                i += 1
+        else:
+            self._add("withdrawals", old_mask, hour)
+            i = 0
+            mask = old_mask
+            while mask:
+                if mask & 1:
+                    self.withdrawn[(key, i)] = ts
+                mask >>= 1
+                i += 1
+
+    def _add(self, field, mask, hour):
+        counts = self.counts[field]
+        i = 0
+        while mask:
+            if mask & 1:
+                counts[i][hour] += 1
+            mask >>= 1
+            i += 1
+
+    def results(self):
+        """{upstream ASN: {field: daily total, "hourly": {field: [count per hour]}}}."""
+        return {asn: dict({field: sum(self.counts[field][i]) for field in self.FIELDS},
+                          hourly={field: self.counts[field][i] for field in self.FIELDS})
+                for i, asn in enumerate(self.state.upstreams)}
+
+
+class OriginWatch:
+    """
+    Routes in the audited address space that are not ours, found during a sweep.
+
+    Like ChurnStats, observe() wraps the record stream handed to
+    sweep_masks(), so the check rides on the same single pass. A route is
+    flagged when its origin is not one of origins (my_asn by default) or
+    its prefix is not one of prefixes (e.g. a more-specific of the audited
+    prefix that we do not announce). Routes already active at start_ts are
+    checked too. results() groups the flagged routes by (prefix, origin)
+    with the half-open [start, end) span they were seen in, the collector
+    peers that carried them and one example path.
+    """
+
+    def __init__(self, state, prefixes, start_ts, end_ts, origins=None):
+        self.state = state
+        self.prefixes = {str(p) for p in prefixes}
+        self.origins = {asn_int(o) for o in origins} if origins else {state.table.my_asn}
+        self.start_ts = start_ts
+        self.end_ts = end_ts
+        self.seeded = False
+        # {route key: (path ID, ts flagged)} for flagged routes still active
+        self.open = {}
+        # {(prefix, origin): {"reason", "start", "end", "peers", "path"}}
+        self.found = {}
+
+    def observe(self, records):
+        for record in records:
+            ts, kind, path, key = record
+            if ts > self.start_ts:
+                # Records up to start_ts are applied first; what they leave active is the starting point
+                self._seed()
+                if ts <= self.end_ts and key is not None and kind is not None:
+                    self._update(ts, kind, path, key)
+            yield record
+        self._seed()
+
+    def _seed(self):
+        if self.seeded:
+            return
+        self.seeded = True
+        for key, pid in self.state.rib.routes.items():
+            self._update(self.start_ts, "A", self.state.table.paths[pid], key)
+
+    def _update(self, ts, kind, path, key):
+        new = None
+        if kind == "A":
+            if not path:
+                return
+            new = self.state.table.intern(path)
+        current = self.open.get(key)
+        if current is not None:
+            if current[0] == new:
+                return
+            del self.open[key]
+            self._note(key, current[0], current[1], ts)
+        if new is not None and self._reason(key[1], new):
+            self.open[key] = (new, ts)
+
+    def _reason(self, prefix, pid):
+        reasons = []
+        if prefix not in self.prefixes:
+            reasons.append("more-specific")
+        if self.state.table.paths[pid][-1] not in self.origins:
+            reasons.append("origin")
+        return ", ".join(reasons)
+
+    def _note(self, key, pid, start, end):
+        path = self.state.table.paths[pid]
+        entry = self.found.get((key[1], path[-1]))
+        if entry is None:
+            entry = self.found[(key[1], path[-1])] = {"reason": self._reason(key[1], pid), "start": start,
+                                                       "end": end, "peers": set(), "path": path}
+        entry["start"] = min(entry["start"], start)
+        entry["end"] = max(entry["end"], end)
+        entry["peers"].add(key[0])
+
+    def results(self):
+        """[{"prefix", "origin", "reason", "start", "end", "peers", "path"}, ...] sorted by start."""
+        for key, (pid, start) in self.open.items():
+            self._note(key, pid, start, self.end_ts + 1)
+        self.open = {}
+        out = [dict(entry, prefix=prefix, origin=str(origin), peers=sorted(entry["peers"]),
+                    path=tuple(str(x) for x in entry["path"]))
+               for (prefix, origin), entry in self.found.items()]
+        return sorted(out, key=lambda e: (e["start"], e["prefix"], e["origin"]))
+
+
+def upstream_presence_records(state, records, start_ts, end_ts, with_intervals=False, with_churn=False,
+                              flap_seconds=FLAP_SECONDS, origin_watch=None, rpki=None):
+    """
+    Per-upstream presence over [start_ts, end_ts] from a single sweep.
+
+    Returns {upstream ASN: {"seen", "dwell_seconds", "changes", "peer_share"}}:
+    dwell_seconds is how long at least one my_asn path went through the
+    upstream, changes counts presence flips after start_ts, and peer_share is
+    the fraction of collector peers with a route for the prefix in the window
+    that saw a my_asn path through the upstream at some point. With
+    with_intervals=True each entry also has "intervals", the half-open
+    [(start, end), ...] spans during which the upstream was present. With
+    with_churn=True each entry also has the ChurnStats counters: daily
+    "announcements", "withdrawals", "path_changes" and "flaps", and the same
+    per hour under "hourly". An OriginWatch passed as origin_watch, and an
+    rpki_vrp.RpkiStats passed as rpki, see the same records; read their
+    results() afterwards.
+    """
+    if origin_watch is not None:
+        records = origin_watch.observe(records)
+    if rpki is not None:
+        records = rpki.observe(records)
+    churn = None
+    if with_churn:
+        churn = ChurnStats(state, start_ts, end_ts, flap_seconds)
+        records = churn.observe(records)
+    n_up = len(state.upstreams)
+    dwell = [0] * n_up
+    changes = [0] * n_up
+    intervals = [[] for _ in range(n_up)]
+    opened = [None] * n_up
+    seen = 0
+    prev_ts = prev_mask = None
+    for ts, mask in sweep_masks(state, records, start_ts, end_ts):
+        if prev_ts is None:
+            state.track_visibility()
+            flipped = mask
+        else:
+            _add_dwell(dwell, prev_mask, ts - prev_ts)
+            flipped = prev_mask ^ mask
+            _add_bits(changes, flipped)
+        if with_intervals:
+            _note_intervals(intervals, opened, flipped, mask, ts)
+        seen |= mask
+        prev_ts, prev_mask = ts, mask
+    _add_dwell(dwell, prev_mask, end_ts + 1 - prev_ts)
+    if with_intervals:
+        _note_intervals(intervals, opened, prev_mask, 0, end_ts + 1)
+    n_peers = len(state.peers_seen)
+    presence = {}
+    for i, asn in enumerate(state.upstreams):
+        presence[asn] = {"seen": bool(seen & (1 << i)), "dwell_seconds": dwell[i], "changes": changes[i],
+                         "peer_share": len(state.upstream_peers[i]) / n_peers if n_peers else 0.0}
+        if with_intervals:
+            presence[asn]["intervals"] = intervals[i]
+    if churn is not None:
+        for asn, counts in churn.results().items():
+            presence[asn].update(counts)
+    return presence
+
+
+def upstream_presence(state, events, start_ts, end_ts, with_intervals=False, with_churn=False,
+                      flap_seconds=FLAP_SECONDS, origin_watch=None, rpki=None):
+    """upstream_presence_records() over a sorted list of BGPlay event dicts."""
+    return upstream_presence_records(state, event_records(events), start_ts, end_ts, with_intervals,
+                                     with_churn, flap_seconds, origin_watch, rpki)
+
+
+def _note_intervals(intervals, opened, flipped, mask, ts):
+    i = 0
+    while flipped:
+        if flipped & 1:
+            if (mask >> i) & 1:
+                opened[i] = ts
+            else:
+                intervals[i].append((opened[i], ts))
+        flipped >>= 1
+        i += 1
+
+
+def _add_dwell(dwell, mask, seconds):
+    i = 0
+    while mask:
+        if mask & 1:
+            dwell[i] += seconds
+        mask >>= 1
+        i += 1
+
+
+def _add_bits(counts, mask):
+    _add_dwell(counts, mask, 1)
+
+
+class RecordFeed:
+    """
+    Hands out one long time-ordered record stream window by window.
+
+    sweep_masks() reads one record past the end of its window; feeding it
+    through until() keeps that record for the next window instead, so one
+    ReplayState can be carried across consecutive days of a continuous
+    source (e.g. MRT files).
+    """
+
+    def __init__(self, records):
+        self.records = iter(records)
+        self.pending = next(self.records, None)
+
+    def until(self, end_ts):
+        """Yields the records with ts <= end_ts."""
+        while self.pending is not None and self.pending[0] <= end_ts:
+            record = self.pending
+            self.pending = next(self.records, None)
+            yield record
+
+
+def split_days(data, windows):
+    """
+    Splits one wide BGPlay window into per-day BGPlay-shaped "data" dicts.
+
+    windows is a date-ordered list of (day, day_start, day_end). Each day gets
+    the events stamped inside its window and an initial_state derived by
+    replaying the wide window up to that day's midnight, so the result can be
+    fed to the same per-day evaluation as a single-day query.
+    Returns [(day, day_start, day_end, day_data), ...].
+    """
+    initial_state, events = parse_bgplay(data)
+    rib = Rib()
+
+    def apply(kind, item, entry):
+        rib.update(kind, route_key(item), path_of(item), entry)
+
+    for st in initial_state:
+        apply("A", st, st)
+
+    days = []
+    i = 0
+    n = len(events)
+    for day, day_start, day_end in windows:
+        start_ts = int(day_start.timestamp())
+        end_ts = int(day_end.timestamp())
+        while i < n and event_ts(events[i]) < start_ts:
+            ev = events[i]
+            attrs = ev.get("attrs") or ev
+            apply(event_kind(ev), ev, {k: v for k, v in attrs.items() if k not in ("type", "timestamp")})
+            i += 1
+        day_initial = list(rib.values())
+        j = i
+        while j < n and event_ts(events[j]) <= end_ts:
+            j += 1
+        days.append((day, day_start, day_end, {"initial_state": day_initial, "events": events[i:j]}))
+    return days
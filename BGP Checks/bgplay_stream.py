@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Streaming ingestion of BGPlay responses.
+
+resp.json() builds the whole BGPlay document as Python dicts, which for
+all-collector queries is far larger than the RIB it describes. This module
+parses initial_state and events incrementally from the response body with
+ijson, turns each entry into a compact (ts, kind, path) record as soon as it
+is complete and feeds it straight into a ReplayState, so peak memory follows
+the active RIB rather than the response size.
+
+ijson is optional (pip install ijson); without it the body is decoded with
+json.load and replayed the same way, just without the memory savings.
+"""
+import json
+
+from bgplay_replay import event_kind, event_ts, raw_path, route_key, upstream_presence_records, upstreams_seen_records
+
+try:
+    import ijson
+    from ijson.common import ObjectBuilder
+except ImportError:
+    ijson = None
+
+INITIAL_PREFIX = "data.initial_state.item"
+EVENTS_PREFIX = "data.events.item"
+
+
+def iter_items(fileobj):
+    """
+    Yields ("initial" | "event", entry dict) in document order.
+
+    Only one entry is materialised at a time when ijson is available.
+    """
+    if ijson is None:
+        data = json.load(fileobj).get("data", {})
+        for st in data.get("initial_state", []) or []:
+            yield "initial", st
+        for ev in data.get("events", []) or []:
+            yield "event", ev
+        return
+
+    builder = None
+    section = None
+    for prefix, event, value in ijson.parse(fileobj, use_float=True):
+        if builder is None:
+            if event == "start_map" and prefix in (INITIAL_PREFIX, EVENTS_PREFIX):
+                section = prefix
+                builder = ObjectBuilder()
+                builder.event(event, value)
+            continue
+        builder.event(event, value)
+        if event == "end_map" and prefix == section:
+            yield ("initial" if section == INITIAL_PREFIX else "event"), builder.value
+            builder = None
+
+
+def iter_records(fileobj):
+    """
+    Yields ("initial", (path, key)) and ("event", (ts, kind, path, key)) records.
+
+    Initial entries without a usable path are dropped here; withdrawals are
+    kept even without a path since the route key identifies what they remove.
+    """
+    for section, item in iter_items(fileobj):
+        path = raw_path(item)
+        if section == "initial":
+            if path:
+                yield "initial", (path, route_key(item))
+        else:
+            yield "event", (event_ts(item), event_kind(item), path, route_key(item))
+
+
+def load_and_events(state, fileobj):
+    """
+    Loads initial_state records into state and yields the event records.
+
+    BGPlay lists events in time order after initial_state; a response that
+    breaks either assumption cannot be replayed as a stream and raises
+    ValueError (use the non-streaming path for it).
+    """
+    seen_event = False
+    last_ts = None
+    for section, record in iter_records(fileobj):
+        if section == "initial":
+            if seen_event:
+                raise ValueError("BGPlay initial_state appears after events; cannot stream this response")
+            state.announce(*record)
+            continue
+        seen_event = True
+        if last_ts is not None and record[0] < last_ts:
+            raise ValueError("BGPlay events are not time-sorted; cannot stream this response")
+        last_ts = record[0]
+        yield record
+
+
+def stream_upstreams_seen(state, fileobj, start_ts, end_ts=None):
+    """upstreams_seen() for a BGPlay response body read from fileobj."""
+    return upstreams_seen_records(state, load_and_events(state, fileobj), start_ts, end_ts)
+
+
+def stream_upstream_presence(state, fileobj, start_ts, end_ts, with_intervals=False, with_churn=False,
+                             origin_watch=None, rpki=None):
+    """upstream_presence() for a BGPlay response body read from fileobj."""
+    return upstream_presence_records(state, load_and_events(state, fileobj), start_ts, end_ts, with_intervals,
+                                     with_churn, origin_watch=origin_watch, rpki=rpki)
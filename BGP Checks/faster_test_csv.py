@@ -1,9 +1,14 @@
 #!/usr/bin/env python3
-import requests
-from datetime import datetime, timedelta, timezone
 import csv
 import os
 
+from bgplay_fetch import day_windows, fetch_days
+from bgplay_columns import day_upstream_presence
+from bgplay_replay import PathTable
+from presence_index import bucket_coverage
+from ripestat_cache import default_cache
+from ripestat_client import default_client
+
 # === Parameters ===
 prefix = "102.217.0.0/22"
 my_asn = "329001"
@@ -14,11 +19,14 @@ dolphin_asn = "37613"    # Dolphin
 first_day_str = "2024-02-01"
 last_day_str  = "2024-02-29"
 
-first_day = datetime.fromisoformat(first_day_str).replace(tzinfo=timezone.utc)
-last_day  = datetime.fromisoformat(last_day_str).replace(tzinfo=timezone.utc)
-current_day = first_day
+# Concurrent BGPlay downloads (days are still evaluated in date order)
+max_workers = 4
+
+# Days per BGPlay query; the wide window is split into days locally (1 = one query per day)
+chunk_days = 7
 
-bgplay_url = "https://stat.ripe.net/data/bgplay/data.json"
+# Per-day presence matrix: % of each slot (minutes long) an upstream was present, None to skip
+matrix_bucket_minutes = 60
 
 # Directory to save CSV
 csv_dir = r"C:\Users\SuleimanAbdulsalam\OneDrive - Kasi, Inc\Routes Check 2024"
@@ -26,81 +34,52 @@ os.makedirs(csv_dir, exist_ok=True)
 
 # Prepare CSV file path for the whole month
 csv_filename = os.path.join(csv_dir, f"data_{first_day_str}_to_{last_day_str}.csv")
+matrix_filename = os.path.join(csv_dir, f"matrix_{first_day_str}_to_{last_day_str}.csv")
+bucket_seconds = int(matrix_bucket_minutes * 60) if matrix_bucket_minutes else None
+matrix_rows = []
 with open(csv_filename, mode="w", newline="") as csvfile:
     writer = csv.writer(csvfile)
     writer.writerow(["Date", "GLO_upstream", "Dolphin_upstream"])
 
-    # Loop over each day
-    while current_day.date() <= last_day.date():
-        day_start = current_day.replace(hour=0, minute=0, second=0)
-        day_end   = current_day.replace(hour=23, minute=59, second=59)
-        
-        # Fetch BGPlay data for this single day
-        params = {
-            "resource": prefix,
-            "starttime": day_start.isoformat(),
-            "endtime": day_end.isoformat(),
-            "unix_timestamps": "true"
-        }
-        resp = requests.get(bgplay_url, params=params)
-        resp.raise_for_status()
-        data = resp.json().get("data", {})
-
-        initial_state = data.get("initial_state", []) or []
-        events = sorted(data.get("events", []) or [], key=lambda e: int(float(e.get("timestamp", 0))))
-
-        # Build list of timestamps to check: start of day + event timestamps
-        timestamps = [int(day_start.timestamp())] + [int(float(ev.get("timestamp", 0))) for ev in events if int(float(ev.get("timestamp", 0))) <= int(day_end.timestamp())]
-
-        # Flags to track if GLO/Dolphin appear this day
-        glo_yes = False
-        dolphin_yes = False
+    # Paths are interned once and reused across the month
+    table = PathTable(my_asn, [glo_asn, dolphin_asn])
 
-        for ts in timestamps:
-            # Rebuild active_paths from scratch at this timestamp
-            active_paths = []
-            for st in initial_state:
-                path = st.get("path") or st.get("as_path") or []
-                if isinstance(path, list) and path:
-                    active_paths.append([str(x) for x in path])
-
-            # Apply all events up to current timestamp
-            for ev in events:
-                ev_ts = int(float(ev.get("timestamp", 0)))
-                if ev_ts > ts:
-                    break
-                typ = str(ev.get("type", "")).lower()
-                path = ev.get("path") or ev.get("as_path") or []
-                if isinstance(path, list) and path:
-                    path = [str(x) for x in path]
-                    if "announce" in typ or typ == "a":
-                        active_paths.append(path)
-                    elif "withdraw" in typ or typ == "w":
-                        try:
-                            active_paths.remove(path)
-                        except ValueError:
-                            pass
-
-            # Filter paths where my ASN is the origin
-            paths_with_my_asn = [p for p in active_paths if p and str(p[-1]) == my_asn]
-
-            # Check if GLO/Dolphin appear in any path
-            if any(str(glo_asn) in p[:-1] for p in paths_with_my_asn):
-                glo_yes = True
-            if any(str(dolphin_asn) in p[:-1] for p in paths_with_my_asn):
-                dolphin_yes = True
-
-            # If both already yes, no need to continue for this day
-            if glo_yes and dolphin_yes:
-                break
+    # Loop over each day as its BGPlay data arrives
+    days = fetch_days(prefix, day_windows(first_day_str, last_day_str), max_workers=max_workers, chunk_days=chunk_days)
+    for current_day, day_start, day_end, data in days:
+        # Evaluate the whole day at once on columnar arrays (falls back to the replay sweep without numpy)
+        presence = day_upstream_presence(data, my_asn, [glo_asn, dolphin_asn],
+                                         int(day_start.timestamp()), int(day_end.timestamp()), table,
+                                         with_intervals=bool(bucket_seconds))
+        glo_yes = presence[glo_asn]["seen"]
+        dolphin_yes = presence[dolphin_asn]["seen"]
 
         # Write result to CSV
         writer.writerow([current_day.strftime('%Y-%m-%d'),
                          "Yes" if glo_yes else "No",
                          "Yes" if dolphin_yes else "No"])
 
+        # One row per upstream: whole-day coverage, then each slot, so partial-day outages show up
+        if bucket_seconds:
+            day_seconds = int(day_end.timestamp()) + 1 - int(day_start.timestamp())
+            for name, asn in (("GLO", glo_asn), ("Dolphin", dolphin_asn)):
+                coverage = bucket_coverage(presence[asn]["intervals"], int(day_start.timestamp()),
+                                           int(day_end.timestamp()), bucket_seconds)
+                matrix_rows.append([current_day.strftime('%Y-%m-%d'), name,
+                                    round(100 * presence[asn]["dwell_seconds"] / day_seconds)]
+                                   + [round(100 * c) for c in coverage])
+
         # Print result to console
         print(f"{current_day.strftime('%Y-%m-%d')} | GLO upstream: {'Yes' if glo_yes else 'No'} | Dolphin upstream: {'Yes' if dolphin_yes else 'No'}")
 
-        # Move to next day
-        current_day += timedelta(days=1)
+if bucket_seconds:
+    with open(matrix_filename, mode="w", newline="") as matrixfile:
+        matrix_writer = csv.writer(matrixfile)
+        matrix_writer.writerow(["Date", "Upstream", "Coverage_pct"]
+                               + [f"{s // 3600:02d}:{s % 3600 // 60:02d}" for s in range(0, 86400, bucket_seconds)])
+        matrix_writer.writerows(matrix_rows)
+    print(f"Presence matrix saved to {matrix_filename}")
+
+# Report how much of the run was served from the on-disk cache, and how the network requests went
+print(default_cache().summary())
+print(default_client().summary())
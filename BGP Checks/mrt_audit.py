@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Daily upstream audit from locally downloaded RIS MRT files.
+
+Same per-day results as Optimized_checks.py, but read from bview/updates
+dumps (e.g. data.ris.ripe.net/rrc00/2025.09/) under --mrt-dir instead of the
+BGPlay API. One ReplayState is carried through the whole range: the bview
+at or before the first day seeds it and every update after that is applied
+once, in time order across collectors.
+
+Examples:
+    python mrt_audit.py --mrt-dir ris/ --from 2025-01-01 --to 2025-12-31
+    python mrt_audit.py --mrt-dir ris/ --from 2025-09-01 --to 2025-09-30 --store route_store
+    python mrt_audit.py --mrt-dir ris/ --from 2025-09-01 --to 2025-09-30 --vrp-file vrps.json
+"""
+import argparse
+import csv
+import os
+
+from bgplay_fetch import day_windows
+from bgplay_replay import OriginWatch, RecordFeed, ReplayState, upstream_presence_records
+from mrt_reader import mrt_records
+from rpki_vrp import RpkiStats, load_vrps
+
+# === Parameters ===
+PREFIX = "102.217.0.0/22"
+MY_ASN = "329001"
+UPSTREAMS = {
+    "GLO": "37148",
+    "Dolphin": "37613",
+}
+CHURN_FIELDS = ["announcements", "withdrawals", "path_changes", "flaps"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Daily upstream audit from local RIS MRT files")
+    parser.add_argument("--mrt-dir", required=True, help="directory holding bview.* and updates.* files")
+    parser.add_argument("--from", dest="first_day", required=True)
+    parser.add_argument("--to", dest="last_day", required=True)
+    parser.add_argument("--collector", default="00",
+                        help="collector number for files not under an rrcNN folder (default: 00)")
+    parser.add_argument("--prefix", default=PREFIX)
+    parser.add_argument("--my-asn", default=MY_ASN)
+    parser.add_argument("--csv", help="output CSV (default: mrt_<from>_to_<to>.csv)")
+    parser.add_argument("--store", help="also write to this Parquet route store")
+    parser.add_argument("--vrp-file", help="RPKI VRP export (JSON or CSV) to validate the observed routes against")
+    args = parser.parse_args()
+
+    names = list(UPSTREAMS)
+    asns = [UPSTREAMS[name] for name in names]
+    windows = day_windows(args.first_day, args.last_day)
+    start_ts = int(windows[0][1].timestamp())
+    end_ts = int(windows[-1][2].timestamp())
+    store = None
+    if args.store:
+        from route_store import RouteStore
+        store = RouteStore(args.store)
+
+    vrps = load_vrps(args.vrp_file, [args.prefix]) if args.vrp_file else None
+
+    state = ReplayState(args.my_asn, asns)
+    feed = RecordFeed(mrt_records(args.mrt_dir, [args.prefix], start_ts, end_ts, args.collector))
+
+    csv_filename = args.csv or f"mrt_{args.first_day}_to_{args.last_day}.csv"
+    with open(csv_filename, mode="w", newline="") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["Date"] + [f"{name}_upstream" for name in names] + [f"{name}_seconds" for name in names]
+                        + [f"{name}_peer_pct" for name in names]
+                        + [f"{name}_{field}" for name in names for field in CHURN_FIELDS]
+                        + ["Unexpected_origins", "Unexpected_more_specifics"]
+                        + (["RPKI_valid", "RPKI_invalid", "RPKI_not_found"] if vrps else []))
+
+        for current_day, day_start, day_end in windows:
+            day_start_ts = int(day_start.timestamp())
+            day_end_ts = int(day_end.timestamp())
+            watch = OriginWatch(state, [args.prefix], day_start_ts, day_end_ts, [args.my_asn])
+            rpki = RpkiStats(state, vrps, day_start_ts, day_end_ts) if vrps else None
+            presence = upstream_presence_records(state, feed.until(day_end_ts), day_start_ts, day_end_ts,
+                                                 with_intervals=store is not None, with_churn=True,
+                                                 origin_watch=watch, rpki=rpki)
+            anomalies = watch.results()
+            validation = rpki.results() if rpki else None
+            day_str = current_day.strftime('%Y-%m-%d')
+            day = [presence[asn] for asn in asns]
+            writer.writerow([day_str] + ["Yes" if p["seen"] else "No" for p in day]
+                            + [p["dwell_seconds"] for p in day]
+                            + [f"{100 * p['peer_share']:.1f}" for p in day]
+                            + [p[field] for p in day for field in CHURN_FIELDS]
+                            + [sum(1 for a in anomalies if "origin" in a["reason"]),
+                               len({a["prefix"] for a in anomalies if "more-specific" in a["reason"]})]
+                            + ([validation["valid"], validation["invalid"], validation["not_found"]]
+                               if validation else []))
+            csvfile.flush()
+            if store is not None:
+                store.add_day(current_day, args.prefix, args.my_asn, presence, dict(zip(asns, names)))
+            print(f"{day_str} | " + " | ".join(
+                f"{name} upstream: {'Yes' if p['seen'] else 'No'} ({p['dwell_seconds']}s, {p['flaps']} flaps)"
+                for name, p in zip(names, day)))
+            for a in anomalies:
+                print(f"  WARNING {a['prefix']} seen with origin AS{a['origin']} ({a['reason']}) "
+                      f"by {len(a['peers'])} peer(s), path {' '.join(a['path'])}")
+            for r in validation["invalid_routes"] if validation else []:
+                print(f"  RPKI INVALID {r['prefix']} from AS{r['origin']}: {r['observations']} observation(s) "
+                      f"by {len(r['peers'])} peer(s)")
+
+    if store is not None:
+        store.flush()
+    print(f"Saved {os.path.abspath(csv_filename)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+Streaming reader for RIS MRT dumps (RFC 6396) as a BGP data source.
+
+Reads TABLE_DUMP_V2 RIB dumps (bview) and BGP4MP update files, plain or
+gzip/bz2 compressed, one record at a time. Only routes for the watched
+prefixes (and their more-specifics) are decoded: RIB records are dropped
+after reading their prefix, and UPDATE messages only have their AS path
+decoded when an announced prefix matches.
+
+The output is the same (ts, kind, path, route key) records the replay
+engine consumes (see bgplay_replay.event_records), with BGPlay-style
+source_ids ("00-195.66.224.175": collector number and peer address), so
+ReplayState, upstream_presence_records() and friends work unchanged. RIB
+entries come out as announcements at their originated time (when the peer
+learned the route, never later than the dump), so a dump seeds the state
+without showing up as churn, and a peer session leaving Established
+withdraws every watched route the peer held.
+"""
+import bz2
+import glob
+import gzip
+import heapq
+import ipaddress
+import os
+import re
+import struct
+from datetime import datetime, timezone
+
+# MRT types and subtypes
+TABLE_DUMP_V2 = 13
+BGP4MP = 16
+BGP4MP_ET = 17
+PEER_INDEX_TABLE = 1
+RIB_IPV4_UNICAST = 2
+RIB_IPV6_UNICAST = 4
+BGP4MP_STATE_CHANGE = 0
+BGP4MP_MESSAGE = 1
+BGP4MP_MESSAGE_AS4 = 4
+BGP4MP_STATE_CHANGE_AS4 = 5
+BGP4MP_MESSAGE_LOCAL = 6
+BGP4MP_MESSAGE_AS4_LOCAL = 7
+
+# BGP path attributes
+ATTR_AS_PATH = 2
+ATTR_MP_REACH_NLRI = 14
+ATTR_MP_UNREACH_NLRI = 15
+ATTR_AS4_PATH = 17
+AS_SET = 1
+AS_TRANS = 23456
+
+BGP_UPDATE = 2
+ESTABLISHED = 6
+
+_HEADER = struct.Struct("!IHHI")
+_FILE_TIME = re.compile(r"(\d{8})\.(\d{4})")
+
+
+def open_mrt(filename):
+    """Opens an MRT file for binary reading, decompressing .gz/.bz2 by content."""
+    with open(filename, "rb") as f:
+        magic = f.read(3)
+    if magic[:2] == b"\x1f\x8b":
+        return gzip.open(filename, "rb")
+    if magic == b"BZh":
+        return bz2.open(filename, "rb")
+    return open(filename, "rb")
+
+
+def iter_mrt(fileobj):
+    """Yields (timestamp, type, subtype, body bytes) for each MRT record."""
+    read = fileobj.read
+    while True:
+        header = read(12)
+        if len(header) < 12:
+            return
+        ts, mrt_type, subtype, length = _HEADER.unpack(header)
+        body = read(length)
+        if len(body) < length:
+            return
+        if mrt_type == BGP4MP_ET:
+            # Extended timestamp: microseconds lead the body
+            mrt_type = BGP4MP
+            body = body[4:]
+        yield ts, mrt_type, subtype, body
+
+
+class PrefixFilter:
+    """Matches raw NLRI against watched prefixes, including their more-specifics."""
+
+    def __init__(self, prefixes):
+        self.nets = {4: [], 6: []}
+        for prefix in prefixes:
+            net = ipaddress.ip_network(str(prefix), strict=False)
+            bits = net.max_prefixlen
+            self.nets[net.version].append((net.prefixlen, int(net.network_address) >> (bits - net.prefixlen)))
+
+    def match(self, version, plen, raw):
+        """The prefix as a string if it falls inside a watched prefix, else None."""
+        nets = self.nets[version]
+        if not nets:
+            return None
+        bits = 32 if version == 4 else 128
+        value = int.from_bytes(raw, "big") << (bits - 8 * len(raw))
+        for wlen, wnet in nets:
+            if plen >= wlen and value >> (bits - wlen) == wnet:
+                return _prefix_str(version, value, plen)
+        return None
+
+
+def _prefix_str(version, value, plen):
+    addr = ipaddress.IPv4Address(value) if version == 4 else ipaddress.IPv6Address(value)
+    return f"{addr}/{plen}"
+
+
+def _nlri(data):
+    """[(prefix length, prefix bytes), ...] from a packed NLRI field."""
+    out = []
+    i = 0
+    n = len(data)
+    while i < n:
+        plen = data[i]
+        size = (plen + 7) // 8
+        out.append((plen, data[i + 1:i + 1 + size]))
+        i += 1 + size
+    return out
+
+
+def _attrs(data):
+    """{attribute type: value bytes} for the attributes this reader uses."""
+    found = {}
+    i = 0
+    n = len(data)
+    while i + 3 <= n:
+        flags = data[i]
+        code = data[i + 1]
+        if flags & 0x10:
+            length = (data[i + 2] << 8) | data[i + 3]
+            i += 4
+        else:
+            length = data[i + 2]
+            i += 3
+        if code in (ATTR_AS_PATH, ATTR_AS4_PATH, ATTR_MP_REACH_NLRI, ATTR_MP_UNREACH_NLRI):
+            found[code] = data[i:i + length]
+        i += length
+    return found
+
+
+def _as_path(data, asn_size):
+    """AS path as a tuple of ints; an AS_SET becomes one "{a,b}" string element."""
+    path = []
+    i = 0
+    fmt = "!%dI" if asn_size == 4 else "!%dH"
+    n = len(data)
+    while i + 2 <= n:
+        seg_type = data[i]
+        count = data[i + 1]
+        i += 2
+        asns = struct.unpack_from(fmt % count, data, i)
+        i += count * asn_size
+        if seg_type == AS_SET:
+            path.append("{" + ",".join(str(a) for a in sorted(asns)) + "}")
+        else:
+            path.extend(asns)
+    return tuple(path)
+
+
+def _merge_as4(as_path, as4_path):
+    """RFC 6793 reconstruction of the 4-byte path from AS_PATH and AS4_PATH."""
+    if not as4_path or len(as4_path) > len(as_path):
+        return as_path
+    return as_path[:len(as_path) - len(as4_path)] + as4_path
+
+
+def _ip(raw):
+    return str(ipaddress.ip_address(raw))
+
+
+def collector_id(path):
+    """BGPlay-style collector number from the last rrcNN component of path ("rrc00" -> "00"), or None."""
+    found = re.findall(r"(?:^|[\\/])rrc(\d+)(?=[\\/]|$)", path or "")
+    return found[-1] if found else None
+
+
+class MrtParser:
+    def __init__(self, prefixes, collector="00"):
+        self.filter = PrefixFilter(prefixes)
+        self.collector = collector
+        # TABLE_DUMP_V2 peer index: [(peer ip, asn), ...]
+        self.peers = []
+        # {source_id: {prefix, ...}} watched routes each peer holds, for session resets
+        self.active = {}
+
+    def _source(self, peer_ip):
+        return f"{self.collector}-{peer_ip}"
+
+    def records(self, fileobj):
+        """Yields (ts, kind, path, (source_id, prefix)) for watched prefixes in an MRT stream."""
+        for ts, mrt_type, subtype, body in iter_mrt(fileobj):
+            if mrt_type == TABLE_DUMP_V2:
+                if subtype == PEER_INDEX_TABLE:
+                    self._peer_index(body)
+                elif subtype in (RIB_IPV4_UNICAST, RIB_IPV6_UNICAST):
+                    yield from self._rib(ts, body, 4 if subtype == RIB_IPV4_UNICAST else 6)
+            elif mrt_type == BGP4MP:
+                if subtype in (BGP4MP_MESSAGE, BGP4MP_MESSAGE_AS4, BGP4MP_MESSAGE_LOCAL, BGP4MP_MESSAGE_AS4_LOCAL):
+                    as4 = subtype in (BGP4MP_MESSAGE_AS4, BGP4MP_MESSAGE_AS4_LOCAL)
+                    yield from self._message(ts, body, as4)
+                elif subtype in (BGP4MP_STATE_CHANGE, BGP4MP_STATE_CHANGE_AS4):
+                    yield from self._state_change(ts, body, subtype == BGP4MP_STATE_CHANGE_AS4)
+
+    # === TABLE_DUMP_V2 ===
+    def _peer_index(self, body):
+        i = 4
+        name_len = struct.unpack_from("!H", body, i)[0]
+        i += 2 + name_len
+        count = struct.unpack_from("!H", body, i)[0]
+        i += 2
+        peers = []
+        for _ in range(count):
+            peer_type = body[i]
+            i += 5
+            ip_len = 16 if peer_type & 1 else 4
+            ip = _ip(body[i:i + ip_len])
+            i += ip_len
+            if peer_type & 2:
+                asn = struct.unpack_from("!I", body, i)[0]
+                i += 4
+            else:
+                asn = struct.unpack_from("!H", body, i)[0]
+                i += 2
+            peers.append((ip, asn))
+        self.peers = peers
+
+    def _rib(self, ts, body, version):
+        plen = body[4]
+        size = (plen + 7) // 8
+        prefix = self.filter.match(version, plen, body[5:5 + size])
+        if prefix is None:
+            return
+        i = 5 + size
+        count = struct.unpack_from("!H", body, i)[0]
+        i += 2
+        for _ in range(count):
+            peer_index, originated, attr_len = struct.unpack_from("!HIH", body, i)
+            i += 8
+            attrs = _attrs(body[i:i + attr_len])
+            i += attr_len
+            path = _as_path(attrs.get(ATTR_AS_PATH, b""), 4)
+            if not path or peer_index >= len(self.peers):
+                continue
+            source = self._source(self.peers[peer_index][0])
+            self.active.setdefault(source, set()).add(prefix)
+            # The dump is a snapshot: each route is announced when the peer learned it
+            yield min(originated, ts), "A", path, (source, prefix)
+
+    # === BGP4MP ===
+    def _peer_header(self, body, as4):
+        asn_size = 4 if as4 else 2
+        i = 2 * asn_size + 2
+        afi = struct.unpack_from("!H", body, i)[0]
+        i += 2
+        ip_len = 16 if afi == 2 else 4
+        peer_ip = _ip(body[i:i + ip_len])
+        return peer_ip, i + 2 * ip_len
+
+    def _message(self, ts, body, as4):
+        peer_ip, i = self._peer_header(body, as4)
+        # BGP message: 16-byte marker, length, type
+        if len(body) < i + 19 or body[i + 18] != BGP_UPDATE:
+            return
+        i += 19
+        withdrawn_len = struct.unpack_from("!H", body, i)[0]
+        i += 2
+        withdrawn = _nlri(body[i:i + withdrawn_len])
+        i += withdrawn_len
+        attr_len = struct.unpack_from("!H", body, i)[0]
+        i += 2
+        attr_data = body[i:i + attr_len]
+        announced = [(4, plen, raw) for plen, raw in _nlri(body[i + attr_len:])]
+        withdrawn = [(4, plen, raw) for plen, raw in withdrawn]
+
+        attrs = _attrs(attr_data)
+        mp_reach = attrs.get(ATTR_MP_REACH_NLRI)
+        if mp_reach:
+            afi = struct.unpack_from("!H", mp_reach, 0)[0]
+            nh_len = mp_reach[3]
+            announced += [(6 if afi == 2 else 4, plen, raw) for plen, raw in _nlri(mp_reach[5 + nh_len:])]
+        mp_unreach = attrs.get(ATTR_MP_UNREACH_NLRI)
+        if mp_unreach:
+            afi = struct.unpack_from("!H", mp_unreach, 0)[0]
+            withdrawn += [(6 if afi == 2 else 4, plen, raw) for plen, raw in _nlri(mp_unreach[3:])]
+
+        source = self._source(peer_ip)
+        held = self.active.setdefault(source, set())
+        for version, plen, raw in withdrawn:
+            prefix = self.filter.match(version, plen, raw)
+            if prefix is not None:
+                held.discard(prefix)
+                yield ts, "W", None, (source, prefix)
+
+        path = None
+        for version, plen, raw in announced:
+            prefix = self.filter.match(version, plen, raw)
+            if prefix is None:
+                continue
+            if path is None:
+                # Only decode the path once something we watch is announced
+                path = _as_path(attrs.get(ATTR_AS_PATH, b""), 4 if as4 else 2)
+                if not as4 and AS_TRANS in path:
+                    path = _merge_as4(path, _as_path(attrs.get(ATTR_AS4_PATH, b""), 4))
+            held.add(prefix)
+            yield ts, "A", path, (source, prefix)
+
+    def _state_change(self, ts, body, as4):
+        peer_ip, i = self._peer_header(body, as4)
+        old_state, new_state = struct.unpack_from("!HH", body, i)
+        if old_state == ESTABLISHED and new_state != ESTABLISHED:
+            source = self._source(peer_ip)
+            for prefix in sorted(self.active.pop(source, ())):
+                yield ts, "W", None, (source, prefix)
+
+
+# === Files ===
+def file_time(filename):
+    """UTC timestamp from a RIS file name such as updates.20250901.0805.gz, or None."""
+    m = _FILE_TIME.search(os.path.basename(filename))
+    if not m:
+        return None
+    return int(datetime.strptime(m.group(1) + m.group(2), "%Y%m%d%H%M").replace(tzinfo=timezone.utc).timestamp())
+
+
+def select_files(directory, start_ts, end_ts, collector="00"):
+    """
+    {collector: [files in replay order]} for RIS files under directory.
+
+    Files are grouped by the rrcNN component of their absolute path, so
+    directory can be ris/ holding rrc00/, rrc01/, ... or a month folder
+    inside one of them; files with no such component (a flat download
+    directory) all belong to collector. For each collector this is the
+    latest bview at or before start_ts followed by every updates file from
+    that dump's time up to end_ts.
+    """
+    by_collector = {}
+    for filename in glob.glob(os.path.join(directory, "**", "*"), recursive=True):
+        name = os.path.basename(filename)
+        ts = file_time(filename)
+        if ts is None or not (name.startswith("bview") or name.startswith("updates")):
+            continue
+        kind = "bview" if name.startswith("bview") else "updates"
+        by_collector.setdefault(collector_id(os.path.abspath(filename)) or collector, []).append((ts, kind, filename))
+
+    selected = {}
+    for found, files in sorted(by_collector.items()):
+        dumps = [(ts, f) for ts, kind, f in files if kind == "bview" and ts <= start_ts]
+        since = max(dumps)[0] if dumps else None
+        chosen = [max(dumps)[1]] if dumps else []
+        # Update files hold the five (RIS) or fifteen minutes starting at their name
+        chosen += [f for ts, kind, f in sorted(files)
+                   if kind == "updates" and (since is None or ts >= since) and ts <= end_ts]
+        if chosen:
+            selected[found] = chosen
+    return selected
+
+
+def file_records(filenames, prefixes, collector="00"):
+    """Records from a collector's files, read in the given order with one parser."""
+    parser = MrtParser(prefixes, collector)
+    for filename in filenames:
+        with open_mrt(filename) as f:
+            yield from parser.records(f)
+
+
+def mrt_records(directory, prefixes, start_ts, end_ts, collector="00"):
+    """
+    Time-ordered replay records for prefixes from every collector under directory
+    (collector names the files outside an rrcNN folder, see select_files()).
+
+    Each collector's files are read in sequence and the per-collector streams
+    are merged by timestamp, so memory stays flat however long the range.
+    """
+    streams = [file_records(files, prefixes, collector)
+               for collector, files in select_files(directory, start_ts, end_ts, collector).items()]
+    return heapq.merge(*streams, key=lambda record: record[0])
@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
-import requests
+import os
 from datetime import datetime, timezone
 
+from bgplay_fetch import fetch_bgplay
+from presence_index import load_or_build
+
 # === Parameters ===
 prefix = "102.217.0.0/22"
 my_asn = "329001"
@@ -17,51 +20,29 @@ check_time_str = "2025-06-13 23:12:53"
 check_time = datetime.fromisoformat(check_time_str).replace(tzinfo=timezone.utc)
 check_ts = int(check_time.timestamp())
 
-# Fetch BGPlay data
-bgplay_url = "https://stat.ripe.net/data/bgplay/data.json"
-params = {
-    "resource": prefix,
-    "starttime": starttime,
-    "endtime": endtime,
-    "unix_timestamps": "true"
-}
-resp = requests.get(bgplay_url, params=params)
-resp.raise_for_status()
-data = resp.json().get("data", {})
-
-initial_state = data.get("initial_state", []) or []
-events = sorted(data.get("events", []) or [], key=lambda e: int(float(e.get("timestamp", 0))))
-
-# Build active paths from initial state
-active_paths = []
-for st in initial_state:
-    path = st.get("path") or st.get("as_path") or []
-    if isinstance(path, list) and path:
-        active_paths.append([str(x) for x in path])
+# Optional window to check for any presence (set both to None to skip)
+range_start_str = "2025-06-13 14:00:00"
+range_end_str   = "2025-06-13 15:00:00"
 
-# Apply events up to the check timestamp
-for ev in events:
-    ts = int(float(ev.get("timestamp", 0)))
-    if ts > check_ts:
-        break
-    typ = str(ev.get("type", "")).lower()
-    path = ev.get("path") or ev.get("as_path") or []
-    if isinstance(path, list) and path:
-        path = [str(x) for x in path]
-        if "announce" in typ or typ == "a":
-            active_paths.append(path)
-        elif "withdraw" in typ or typ == "w":
-            try:
-                active_paths.remove(path)
-            except ValueError:
-                pass
+# Fetch BGPlay data (only when no saved presence index exists for this window)
+index_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "presence_index")
+start = datetime.fromisoformat(starttime).replace(tzinfo=timezone.utc)
+end = datetime.fromisoformat(endtime).replace(tzinfo=timezone.utc)
+start_ts = int(start.timestamp())
+end_ts = int(end.timestamp())
+index = load_or_build(index_dir, prefix, start_ts, end_ts, lambda: fetch_bgplay(prefix, start, end))
 
-# Collect all active paths where my ASN is the origin
-paths_with_my_asn = [p for p in active_paths if p and str(p[-1]) == my_asn]
-
-# Check if at least one path has GLO or Dolphin upstream
-glo_up = any(glo_asn in p[:-1] for p in paths_with_my_asn)
-dolphin_up = any(dolphin_asn in p[:-1] for p in paths_with_my_asn)
+# Point-in-time check
+glo_up = index.upstream_at(my_asn, glo_asn, check_ts)
+dolphin_up = index.upstream_at(my_asn, dolphin_asn, check_ts)
 
 # Print simplified result
 print(f"GLO upstream: {'Yes' if glo_up else 'No'} | Dolphin upstream: {'Yes' if dolphin_up else 'No'}")
+
+# Range check: was the upstream present at any time in the window?
+if range_start_str and range_end_str:
+    range_start_ts = int(datetime.fromisoformat(range_start_str).replace(tzinfo=timezone.utc).timestamp())
+    range_end_ts = int(datetime.fromisoformat(range_end_str).replace(tzinfo=timezone.utc).timestamp())
+    glo_any = index.upstream_between(my_asn, glo_asn, range_start_ts, range_end_ts)
+    dolphin_any = index.upstream_between(my_asn, dolphin_asn, range_start_ts, range_end_ts)
+    print(f"{range_start_str} to {range_end_str} | GLO upstream: {'Yes' if glo_any else 'No'} | Dolphin upstream: {'Yes' if dolphin_any else 'No'}")
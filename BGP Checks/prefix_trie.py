@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Binary radix trie over IPv4 and IPv6 prefixes.
+
+Each prefix is stored at the node reached by walking its network bits from
+the root, so exact and covering lookups cost O(prefix length) regardless of
+how many prefixes are stored, and more-specific lookups only visit the
+subtree under the query prefix. Built once per run and reused across days.
+"""
+import ipaddress
+
+
+class _Node:
+    __slots__ = ("children", "prefix", "value", "has_value")
+
+    def __init__(self):
+        self.children = [None, None]
+        self.prefix = None
+        self.value = None
+        self.has_value = False
+
+
+def _network(prefix):
+    return ipaddress.ip_network(str(prefix), strict=False)
+
+
+def _bits(net):
+    addr = int(net.network_address)
+    top = net.max_prefixlen - 1
+    for i in range(net.prefixlen):
+        yield (addr >> (top - i)) & 1
+
+
+class PrefixTrie:
+    def __init__(self):
+        self.roots = {4: _Node(), 6: _Node()}
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, prefix):
+        node = self._find(_network(prefix))
+        return node is not None and node.has_value
+
+    def _find(self, net):
+        node = self.roots[net.version]
+        for bit in _bits(net):
+            node = node.children[bit]
+            if node is None:
+                return None
+        return node
+
+    def _node(self, net):
+        node = self.roots[net.version]
+        for bit in _bits(net):
+            child = node.children[bit]
+            if child is None:
+                child = node.children[bit] = _Node()
+            node = child
+        return node
+
+    def insert(self, prefix, value=True):
+        """Stores value for prefix (replacing any previous value)."""
+        net = _network(prefix)
+        node = self._node(net)
+        if not node.has_value:
+            self.size += 1
+            node.has_value = True
+            node.prefix = str(net)
+        node.value = value
+        return value
+
+    def setdefault(self, prefix, default):
+        """Like dict.setdefault: returns the stored value, inserting default if absent."""
+        net = _network(prefix)
+        node = self._node(net)
+        if not node.has_value:
+            self.size += 1
+            node.has_value = True
+            node.prefix = str(net)
+            node.value = default
+        return node.value
+
+    def get(self, prefix, default=None):
+        """Value stored for exactly this prefix, or default."""
+        node = self._find(_network(prefix))
+        return node.value if node is not None and node.has_value else default
+
+    def covering(self, prefix, include_exact=True):
+        """
+        [(prefix, value), ...] for stored prefixes that contain prefix,
+        least specific first.
+        """
+        net = _network(prefix)
+        node = self.roots[net.version]
+        found = []
+        if node.has_value:
+            found.append((node.prefix, node.value))
+        for bit in _bits(net):
+            node = node.children[bit]
+            if node is None:
+                break
+            if node.has_value:
+                found.append((node.prefix, node.value))
+        if not include_exact and found and found[-1][0] == str(net):
+            found.pop()
+        return found
+
+    def more_specifics(self, prefix):
+        """[(prefix, value), ...] for stored prefixes strictly inside prefix."""
+        node = self._find(_network(prefix))
+        if node is None:
+            return []
+        found = []
+        stack = [child for child in node.children if child is not None]
+        while stack:
+            node = stack.pop()
+            if node.has_value:
+                found.append((node.prefix, node.value))
+            stack.extend(child for child in node.children if child is not None)
+        return sorted(found, key=lambda item: _network(item[0]))
+
+    def items(self):
+        """Every stored (prefix, value)."""
+        found = []
+        for root in self.roots.values():
+            stack = [root]
+            while stack:
+                node = stack.pop()
+                if node.has_value:
+                    found.append((node.prefix, node.value))
+                stack.extend(child for child in node.children if child is not None)
+        return found
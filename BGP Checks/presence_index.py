@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Per-day upstream presence timeline.
+
+One replay of a BGPlay day produces, for every (origin, upstream ASN) pair and
+for every distinct AS path, the sorted list of half-open [start, end) intervals
+during which it was active. Point and range questions are then answered with a
+binary search instead of a fresh download and replay, and the index can be
+saved to disk so repeated lookups skip both. bucket_coverage() turns any
+interval list into per-slot (e.g. hourly) coverage for reporting.
+"""
+import json
+import os
+from bisect import bisect_right
+from collections import Counter
+
+from bgplay_replay import Rib, event_kind, event_ts, parse_bgplay, path_of, route_key
+from ripestat_cache import window_closed
+
+
+class PresenceIndex:
+    def __init__(self, start_ts, end_ts, upstreams=None, paths=None):
+        self.start_ts = start_ts
+        self.end_ts = end_ts
+        # {(origin, upstream asn): [(start, end), ...]}
+        self.upstreams = upstreams or {}
+        # {as path tuple: [(start, end), ...]}
+        self.paths = paths or {}
+        self._starts = {}
+
+    # === Building ===
+    @classmethod
+    def build(cls, data, start_ts, end_ts):
+        """
+        Builds the index from a BGPlay "data" dict in a single pass.
+
+        Events at or before start_ts count as already applied at start_ts;
+        events after end_ts are ignored. Intervals still open at the end are
+        closed at end_ts + 1.
+        """
+        initial_state, events = parse_bgplay(data)
+        index = cls(start_ts, end_ts)
+        rib = Rib()
+        active = Counter()
+        pair_counts = Counter()
+        open_paths = {}
+        open_pairs = {}
+
+        def add(path, ts):
+            active[path] += 1
+            if active[path] == 1:
+                open_paths[path] = ts
+            origin = path[-1]
+            for asn in set(path[:-1]):
+                key = (origin, asn)
+                pair_counts[key] += 1
+                if pair_counts[key] == 1:
+                    open_pairs[key] = ts
+
+        def remove(path, ts):
+            active[path] -= 1
+            if not active[path]:
+                del active[path]
+                index._close(index.paths, path, open_paths.pop(path), ts)
+            origin = path[-1]
+            for asn in set(path[:-1]):
+                key = (origin, asn)
+                pair_counts[key] -= 1
+                if not pair_counts[key]:
+                    del pair_counts[key]
+                    index._close(index.upstreams, key, open_pairs.pop(key), ts)
+
+        def update(kind, item, ts):
+            removed, added = rib.update(kind, route_key(item), path_of(item))
+            if removed is not None:
+                remove(removed, ts)
+            if added is not None:
+                add(added, ts)
+
+        for st in initial_state:
+            update("A", st, start_ts)
+
+        for ev in events:
+            ts = event_ts(ev)
+            if ts > end_ts:
+                break
+            update(event_kind(ev), ev, max(ts, start_ts))
+
+        for path, ts in open_paths.items():
+            index._close(index.paths, path, ts, end_ts + 1)
+        for key, ts in open_pairs.items():
+            index._close(index.upstreams, key, ts, end_ts + 1)
+        for intervals in list(index.paths.values()) + list(index.upstreams.values()):
+            intervals.sort()
+        return index
+
+    @staticmethod
+    def _close(table, key, start, end):
+        if end <= start:
+            return
+        intervals = table.setdefault(key, [])
+        # Merge with the previous interval when the path comes straight back
+        if intervals and intervals[-1][1] == start:
+            intervals[-1] = (intervals[-1][0], end)
+        else:
+            intervals.append((start, end))
+
+    # === Queries ===
+    def _lookup(self, table, key):
+        intervals = table.get(key)
+        if not intervals:
+            return None, None
+        starts = self._starts.get(id(intervals))
+        if starts is None:
+            starts = [s for s, _ in intervals]
+            self._starts[id(intervals)] = starts
+        return intervals, starts
+
+    def _active_at(self, table, key, ts):
+        intervals, starts = self._lookup(table, key)
+        if not intervals:
+            return False
+        i = bisect_right(starts, ts) - 1
+        return i >= 0 and intervals[i][1] > ts
+
+    def _active_between(self, table, key, from_ts, to_ts):
+        intervals, starts = self._lookup(table, key)
+        if not intervals:
+            return False
+        i = bisect_right(starts, to_ts) - 1
+        return i >= 0 and intervals[i][1] > from_ts
+
+    def upstream_at(self, origin, asn, ts):
+        """True if a path originated by origin went through asn at ts."""
+        return self._active_at(self.upstreams, (str(origin), str(asn)), ts)
+
+    def upstream_between(self, origin, asn, from_ts, to_ts):
+        """True if origin was reachable through asn at any time in [from_ts, to_ts]."""
+        return self._active_between(self.upstreams, (str(origin), str(asn)), from_ts, to_ts)
+
+    def upstreams_at(self, origin, ts):
+        """Sorted upstream ASNs carrying origin's paths at ts."""
+        origin = str(origin)
+        return sorted(asn for (o, asn) in self.upstreams
+                      if o == origin and self._active_at(self.upstreams, (o, asn), ts))
+
+    def upstream_coverage(self, origin, asn, bucket_seconds=3600):
+        """Share of each bucket_seconds slot of the window during which origin went through asn."""
+        return bucket_coverage(self.upstreams.get((str(origin), str(asn)), []), self.start_ts, self.end_ts,
+                               bucket_seconds)
+
+    def paths_at(self, ts, origin=None):
+        """Active AS paths at ts, optionally only those originated by origin."""
+        return sorted(p for p in self.paths
+                      if (origin is None or p[-1] == str(origin)) and self._active_at(self.paths, p, ts))
+
+    # === Serialization ===
+    def to_dict(self):
+        return {
+            "start_ts": self.start_ts,
+            "end_ts": self.end_ts,
+            "upstreams": [[origin, asn, intervals] for (origin, asn), intervals in self.upstreams.items()],
+            "paths": [[list(path), intervals] for path, intervals in self.paths.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        upstreams = {(origin, asn): [tuple(iv) for iv in intervals] for origin, asn, intervals in d["upstreams"]}
+        paths = {tuple(path): [tuple(iv) for iv in intervals] for path, intervals in d["paths"]}
+        return cls(d["start_ts"], d["end_ts"], upstreams, paths)
+
+    def save(self, filename):
+        tmp = filename + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, filename)
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename) as f:
+            return cls.from_dict(json.load(f))
+
+
+def bucket_coverage(intervals, start_ts, end_ts, bucket_seconds=3600):
+    """
+    Share (0.0-1.0) of each bucket_seconds slot of [start_ts, end_ts] covered
+    by half-open [(start, end), ...] intervals.
+
+    Slots start at start_ts; the last one is shorter when the window does not
+    divide evenly. Each interval is split over the slots it spans, so a day
+    costs one pass over its intervals rather than a lookup per slot.
+    """
+    window_end = end_ts + 1
+    n_slots = max(1, -(-(window_end - start_ts) // bucket_seconds))
+    covered = [0] * n_slots
+    for start, end in intervals:
+        start = max(start, start_ts)
+        end = min(end, window_end)
+        while start < end:
+            slot = (start - start_ts) // bucket_seconds
+            edge = min(end, start_ts + (slot + 1) * bucket_seconds)
+            covered[slot] += edge - start
+            start = edge
+    return [seconds / min(bucket_seconds, window_end - start_ts - slot * bucket_seconds)
+            for slot, seconds in enumerate(covered)]
+
+
+def index_filename(index_dir, prefix, start_ts, end_ts):
+    safe_prefix = prefix.replace("/", "_").replace(":", "-")
+    return os.path.join(index_dir, f"presence_{safe_prefix}_{start_ts}_{end_ts}.json")
+
+
+def load_or_build(index_dir, prefix, start_ts, end_ts, fetch):
+    """
+    Returns the saved index for this prefix/window, building it if needed.
+
+    fetch is called with no arguments and must return the BGPlay "data" dict;
+    it is only called when no saved index exists. Only windows that
+    ripestat_cache.window_closed() considers final are saved; an index of a
+    window that can still change is built for this call only.
+    """
+    filename = index_filename(index_dir, prefix, start_ts, end_ts)
+    if os.path.exists(filename):
+        return PresenceIndex.load(filename)
+    index = PresenceIndex.build(fetch(), start_ts, end_ts)
+    if window_closed({"endtime": end_ts}):
+        os.makedirs(index_dir, exist_ok=True)
+        index.save(filename)
+    return index
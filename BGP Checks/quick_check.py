@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
-import requests
+import os
 from datetime import datetime, timezone
 
+from bgplay_fetch import fetch_bgplay
+from presence_index import load_or_build
+
 # === Parameters ===
 prefix = "102.217.0.0/22"
 my_asn = "329001"
@@ -17,47 +20,16 @@ check_time_str = "2025-06-13 15:00:00"
 check_time = datetime.fromisoformat(check_time_str).replace(tzinfo=timezone.utc)
 check_ts = int(check_time.timestamp())
 
-# Fetch BGPlay data
-bgplay_url = "https://stat.ripe.net/data/bgplay/data.json"
-params = {
-    "resource": prefix,
-    "starttime": starttime,
-    "endtime": endtime,
-    "unix_timestamps": "true"
-}
-resp = requests.get(bgplay_url, params=params)
-resp.raise_for_status()
-data = resp.json().get("data", {})
-
-initial_state = data.get("initial_state", []) or []
-events = sorted(data.get("events", []) or [], key=lambda e: int(float(e.get("timestamp", 0))))
-
-# Build active paths from initial state
-active_paths = []
-for st in initial_state:
-    path = st.get("path") or st.get("as_path") or []
-    if isinstance(path, list) and path:
-        active_paths.append([str(x) for x in path])
-
-# Apply events up to the check timestamp
-for ev in events:
-    ts = int(float(ev.get("timestamp", 0)))
-    if ts > check_ts:
-        break
-    typ = str(ev.get("type", "")).lower()
-    path = ev.get("path") or ev.get("as_path") or []
-    if isinstance(path, list) and path:
-        path = [str(x) for x in path]
-        if "announce" in typ or typ == "a":
-            active_paths.append(path)
-        elif "withdraw" in typ or typ == "w":
-            try:
-                active_paths.remove(path)
-            except ValueError:
-                pass
+# Fetch BGPlay data (only when no saved presence index exists for this window)
+index_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "presence_index")
+start = datetime.fromisoformat(starttime).replace(tzinfo=timezone.utc)
+end = datetime.fromisoformat(endtime).replace(tzinfo=timezone.utc)
+start_ts = int(start.timestamp())
+end_ts = int(end.timestamp())
+index = load_or_build(index_dir, prefix, start_ts, end_ts, lambda: fetch_bgplay(prefix, start, end))
 
 # Collect all active paths where my ASN is the origin
-paths_with_my_asn = [p for p in active_paths if p and str(p[-1]) == my_asn]
+paths_with_my_asn = [list(p) for p in index.paths_at(check_ts, origin=my_asn)]
 
 # Print results
 if not paths_with_my_asn:
@@ -72,5 +44,5 @@ else:
         print(f"  Dolphin ({dolphin_asn}) upstream?: {'Yes' if dolphin_asn in upstream else 'No'}\n")
 
 # Optional: print a summary of all unique upstream ASNs across all paths
-unique_upstreams = set(asn for p in paths_with_my_asn for asn in p[:-1])
-print(f"Unique upstream ASNs at {check_time_str} UTC: {sorted(unique_upstreams)}")
+unique_upstreams = index.upstreams_at(my_asn, check_ts)
+print(f"Unique upstream ASNs at {check_time_str} UTC: {unique_upstreams}")
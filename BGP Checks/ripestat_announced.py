@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Batched RIPEstat announced-prefixes lookups over a date range.
+
+Instead of one request per ASN per day, each ASN is queried once for the
+whole range and the per-prefix "timelines" in the response are used to work
+out locally which prefixes were announced on each day. ASNs are queried
+concurrently through the shared RIPEstat client.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from ripestat_cache import default_cache
+from ripestat_client import default_client
+from ripestat_urls import data_url
+
+ANNOUNCED_URL = data_url("announced-prefixes")
+MAX_WORKERS = 4
+
+
+def _ts(value):
+    dt = datetime.fromisoformat(str(value))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def fetch_announced(asn, start, end, cache=None, client=None):
+    """Fetches announced-prefixes for asn over [start, end] and returns its "data" dict."""
+    params = {
+        "resource": str(asn),
+        "starttime": start.isoformat(),
+        "endtime": end.isoformat()
+    }
+
+    client = client or default_client()
+
+    def fetch():
+        return client.get_json(ANNOUNCED_URL, params)
+
+    cache = cache or default_cache()
+    return cache.get_json(ANNOUNCED_URL, params, fetch).get("data", {})
+
+
+def daily_prefixes(data, windows):
+    """
+    {date string: [prefixes announced that day]} from one range response.
+
+    A prefix counts for a day when one of its timelines overlaps the day's
+    window. Prefixes keep the order RIPEstat returned them in.
+    """
+    spans = []
+    for p in data.get("prefixes", []):
+        if "prefix" not in p:
+            continue
+        spans.append((p["prefix"], [(_ts(t["starttime"]), _ts(t["endtime"])) for t in p.get("timelines", [])]))
+
+    days = {}
+    for day, day_start, day_end in windows:
+        start_ts = int(day_start.timestamp())
+        end_ts = int(day_end.timestamp())
+        days[day.strftime('%Y-%m-%d')] = [prefix for prefix, timelines in spans
+                                          if any(s <= end_ts and e > start_ts for s, e in timelines)]
+    return days
+
+
+def announced_by_day(asns, windows, max_workers=MAX_WORKERS):
+    """
+    {asn: {date string: [prefixes]}} for every ASN over the date windows.
+
+    One request per ASN covers the whole range; the ASNs run concurrently.
+    """
+    windows = list(windows)
+    start = windows[0][1]
+    end = windows[-1][2]
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {str(asn): pool.submit(fetch_announced, asn, start, end) for asn in asns}
+        return {asn: daily_prefixes(future.result(), windows) for asn, future in futures.items()}
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Persistent compressed on-disk cache for RIPEstat responses.
+
+Entries are content-addressed by endpoint and query parameters (resource and
+time window included) and stored as gzip-compressed JSON. Only windows that
+ended more than SETTLE_SECONDS ago are cached: by then the collectors' late
+updates are published and the data no longer changes, so they are never
+fetched again. The cache is bounded in size and evicts the least recently
+used entries first.
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+# RIPESTAT_CACHE_DIR overrides the location, e.g. a fresh directory per load test
+CACHE_DIR = (os.environ.get("RIPESTAT_CACHE_DIR")
+             or os.path.join(os.path.dirname(os.path.abspath(__file__)), "ripestat_cache"))
+MAX_BYTES = 2 * 1024 ** 3   # 2 GB
+SETTLE_SECONDS = 6 * 3600   # how long after a window ends RIS/RIPEstat may still add updates to it
+
+
+def cache_key(url, params):
+    blob = json.dumps([url, sorted((str(k), str(v)) for k, v in (params or {}).items())])
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def window_closed(params, now=None, settle=SETTLE_SECONDS):
+    """True if the query's endtime is more than settle seconds in the past, i.e. its data is final."""
+    end = (params or {}).get("endtime")
+    if not end:
+        return False
+    try:
+        end_ts = float(end)
+    except (TypeError, ValueError):
+        end_dt = datetime.fromisoformat(str(end))
+        if end_dt.tzinfo is None:
+            end_dt = end_dt.replace(tzinfo=timezone.utc)
+        end_ts = end_dt.timestamp()
+    return end_ts < (now if now is not None else time.time()) - settle
+
+
+class ResponseCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.saved_seconds = 0.0
+        self.fetch_seconds = 0.0
+        self._size = None
+
+    def _path(self, key, suffix=".json.gz"):
+        return os.path.join(self.cache_dir, key[:2], key + suffix)
+
+    def get_json(self, url, params, fetch):
+        """
+        Returns the decoded JSON response for (url, params).
+
+        fetch() is called on a miss and must return the decoded response;
+        results for closed windows are stored, open windows always go to fetch.
+        """
+        if not window_closed(params):
+            with self.lock:
+                self.bypassed += 1
+            return fetch()
+
+        key = cache_key(url, params)
+        entry = self._read(key)
+        if entry is not None:
+            with self.lock:
+                self.hits += 1
+                self.saved_seconds += entry.get("elapsed", 0.0)
+            return entry["response"]
+
+        started = time.monotonic()
+        response = fetch()
+        elapsed = time.monotonic() - started
+        with self.lock:
+            self.misses += 1
+            self.fetch_seconds += elapsed
+        self._write(key, {"url": url, "params": params, "fetched_at": time.time(),
+                          "elapsed": elapsed, "response": response})
+        return response
+
+    def open_stream(self, url, params, download):
+        """
+        Returns a binary file object holding the raw response body for (url, params).
+
+        download(f) is called on a miss and must write the body to the binary
+        file f. Closed windows are kept gzip-compressed in the cache; open
+        windows are downloaded to a temporary file. The caller closes the file.
+        """
+        if not window_closed(params):
+            with self.lock:
+                self.bypassed += 1
+            f = tempfile.TemporaryFile()
+            download(f)
+            f.seek(0)
+            return f
+
+        path = self._path(cache_key(url, params), ".raw.gz")
+        if os.path.exists(path):
+            elapsed = self._read_meta(path)
+            with self.lock:
+                self.hits += 1
+                self.saved_seconds += elapsed
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return gzip.open(path, "rb")
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        started = time.monotonic()
+        with gzip.open(tmp, "wb") as f:
+            download(f)
+        elapsed = time.monotonic() - started
+        # Download time for the summary's "saved" figure, written before the body becomes visible
+        with open(path + ".meta", "w") as f:
+            json.dump({"url": url, "params": params, "fetched_at": time.time(), "elapsed": elapsed}, f)
+        os.replace(tmp, path)
+        with self.lock:
+            self.misses += 1
+            self.fetch_seconds += elapsed
+        self._account(path)
+        return gzip.open(path, "rb")
+
+    def _read(self, key):
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, EOFError, ValueError):
+            return None
+        # Touch the file so eviction sees it as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    @staticmethod
+    def _read_meta(path):
+        try:
+            with open(path + ".meta") as f:
+                return json.load(f).get("elapsed", 0.0)
+        except (OSError, ValueError):
+            return 0.0
+
+    def _write(self, key, entry):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
+        self._account(path)
+
+    def _account(self, path):
+        """Adds a newly written entry to the size total and evicts if needed."""
+        with self.lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += os.path.getsize(path)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".gz"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    yield st.st_mtime, st.st_size, path
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        """Deletes least recently used entries until the cache is 90% of max_bytes."""
+        target = self.max_bytes * 0.9
+        for _, size, path in sorted(self._entries()):
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+                self._size -= size
+            except OSError:
+                pass
+            if path.endswith(".raw.gz"):
+                try:
+                    os.remove(path + ".meta")
+                except OSError:
+                    pass
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        hit_rate = (100.0 * self.hits / lookups) if lookups else 0.0
+        return (f"RIPEstat cache: {self.hits} hits, {self.misses} misses ({hit_rate:.0f}% hit rate), "
+                f"{self.bypassed} uncached open windows, ~{self.saved_seconds:.1f}s network time saved, "
+                f"{self.fetch_seconds:.1f}s spent fetching")
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    """Shared cache instance used by the BGP scripts."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache()
+        return _default_cache
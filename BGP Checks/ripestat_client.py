@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP client for all RIPEstat Data API calls.
+
+One keep-alive connection pool is reused by every request in a run, so only
+the first request to a host pays the TCP and TLS handshake. Every request
+start (retries included) takes a token from a bucket shared by all threads.
+429, 5xx and connection errors are retried with exponential backoff and full
+jitter, waiting at least as long as any Retry-After header asks. Latency,
+retries and failures are counted per endpoint for the end-of-run summary.
+"""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# RIPEstat asks clients to keep the request rate modest
+REQUESTS_PER_SECOND = 4.0
+BURST = 4
+
+POOL_SIZE = 8
+MAX_RETRIES = 6
+BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 120.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# (connect, read) seconds; BGPlay answers for busy prefixes can take minutes
+TIMEOUT = (10, 300)
+
+
+class TokenBucket:
+    """Allows `rate` requests per second with bursts of up to `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = max(1.0, burst or rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        """0 if a request may proceed now, else seconds until the next token."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def wait(self):
+        """Blocks until a token is available and takes it."""
+        while True:
+            delay = self.take()
+            if not delay:
+                return
+            time.sleep(delay)
+
+
+def retry_after_seconds(resp):
+    """Seconds asked for by a Retry-After header (delta or HTTP date), or None."""
+    value = resp.headers.get("Retry-After") if resp is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RipestatClient:
+    def __init__(self, rate=REQUESTS_PER_SECOND, burst=BURST, max_retries=MAX_RETRIES,
+                 backoff=BACKOFF_SECONDS, max_backoff=MAX_BACKOFF_SECONDS, timeout=TIMEOUT,
+                 pool_size=POOL_SIZE):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        # {endpoint path: {"requests", "retries", "failures", "latencies": [seconds, ...]}}
+        self.stats = {}
+
+    def _delay(self, attempt, resp):
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        asked = retry_after_seconds(resp)
+        return max(delay, asked) if asked is not None else delay
+
+    def _record(self, endpoint, latency=None, retry=False, failure=False):
+        with self.lock:
+            stats = self.stats.setdefault(endpoint, {"requests": 0, "retries": 0, "failures": 0, "latencies": []})
+            if latency is not None:
+                stats["requests"] += 1
+                stats["latencies"].append(latency)
+            if retry:
+                stats["retries"] += 1
+            if failure:
+                stats["failures"] += 1
+
+    def get(self, url, params=None, stream=False, max_retries=None):
+        """
+        GET url and return the successful response.
+
+        Retries 429/5xx answers and connection errors up to max_retries times
+        (the client's setting unless given; 429 answers always get the
+        client's), then raises (requests.HTTPError for a final bad status).
+        With stream=True the caller reads and closes the response.
+        """
+        endpoint = urlsplit(url).path
+        limit = self.max_retries if max_retries is None else max_retries
+        attempt = 0
+        while True:
+            if self.bucket:
+                self.bucket.wait()
+            started = time.monotonic()
+            try:
+                resp = self.session.get(url, params=params, stream=stream, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                self._record(endpoint, time.monotonic() - started)
+                if attempt >= limit:
+                    self._record(endpoint, failure=True)
+                    raise
+                self._record(endpoint, retry=True)
+                time.sleep(self._delay(attempt, None))
+                attempt += 1
+                continue
+            self._record(endpoint, time.monotonic() - started)
+
+            if resp.status_code in RETRY_STATUSES and attempt < (self.max_retries if resp.status_code == 429
+                                                                 else limit):
+                delay = self._delay(attempt, resp)
+                resp.close()
+                self._record(endpoint, retry=True)
+                time.sleep(delay)
+                attempt += 1
+                continue
+            if resp.status_code >= 400:
+                self._record(endpoint, failure=True)
+                resp.close()
+            resp.raise_for_status()
+            return resp
+
+    def get_json(self, url, params=None, max_retries=None):
+        """Decoded JSON body of a successful GET."""
+        with self.get(url, params, max_retries=max_retries) as resp:
+            return resp.json()
+
+    def summary(self):
+        lines = []
+        with self.lock:
+            for endpoint, stats in sorted(self.stats.items()):
+                latencies = sorted(stats["latencies"])
+                if latencies:
+                    p50 = latencies[len(latencies) // 2]
+                    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+                    timing = f"p50 {p50:.2f}s, p95 {p95:.2f}s, max {latencies[-1]:.2f}s"
+                else:
+                    timing = "no timings"
+                lines.append(f"RIPEstat {endpoint}: {stats['requests']} requests, {stats['retries']} retries, "
+                             f"{stats['failures']} failures; {timing}")
+        return "\n".join(lines) or "RIPEstat: no network requests"
+
+
+_default_client = None
+_default_lock = threading.Lock()
+
+
+def default_client():
+    """Shared client used by the BGP scripts."""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = RipestatClient()
+        return _default_client
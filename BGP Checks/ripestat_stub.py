@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Record/replay stand-in for the RIPEstat Data API.
+
+In record mode the server forwards every request to the real RIPEstat (or any
+--upstream), returns the response and saves it under --dir. In serve mode it
+answers only from those recordings, so audits and benchmarks can be rerun
+offline with identical data. Either mode can add response latency, answer
+with 429 + Retry-After once a token-bucket rate limit is exceeded, and fail
+a share of requests with 503, to load-test the concurrent fetchers without
+hammering RIPE.
+
+Point the BGP scripts at it with RIPESTAT_BASE_URL (see ripestat_urls.py),
+and give them an empty RIPESTAT_CACHE_DIR so the local response cache does
+not answer in its place:
+
+    python ripestat_stub.py record --port 8080
+    RIPESTAT_BASE_URL=http://127.0.0.1:8080 RIPESTAT_CACHE_DIR=/tmp/stub_cache python test.py
+    python ripestat_stub.py serve --port 8080 --latency 0.5 --jitter 0.2 --rate 4 --burst 8
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+
+from ripestat_cache import cache_key
+from ripestat_client import TokenBucket
+from ripestat_urls import DEFAULT_BASE_URL
+
+RECORDINGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ripestat_recordings")
+COPY_CHUNK_BYTES = 1024 * 1024
+
+
+class Recordings:
+    """Response bodies on disk, keyed by request path and query parameters."""
+
+    def __init__(self, directory=RECORDINGS_DIR):
+        self.directory = directory
+
+    def _files(self, path, params):
+        key = cache_key(path, params)
+        base = os.path.join(self.directory, key[:2], key)
+        return base + ".json", base + ".body.gz"
+
+    def get(self, path, params):
+        """(meta dict, body file name) for a recorded request, or (None, None)."""
+        meta_file, body_file = self._files(path, params)
+        try:
+            with open(meta_file) as f:
+                return json.load(f), body_file
+        except (OSError, ValueError):
+            return None, None
+
+    def record(self, path, params, resp):
+        """Saves a streamed requests response; returns (meta, body file name)."""
+        meta_file, body_file = self._files(path, params)
+        os.makedirs(os.path.dirname(meta_file), exist_ok=True)
+        tmp = f"{body_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        size = 0
+        with gzip.open(tmp, "wb") as f:
+            for chunk in resp.iter_content(chunk_size=COPY_CHUNK_BYTES):
+                f.write(chunk)
+                size += len(chunk)
+        os.replace(tmp, body_file)
+        meta = {"path": path, "params": params, "status": resp.status_code,
+                "content_type": resp.headers.get("Content-Type", "application/json"),
+                "size": size, "recorded_at": time.time()}
+        with open(meta_file + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(meta_file + ".tmp", meta_file)
+        return meta, body_file
+
+    def __len__(self):
+        return sum(1 for _, _, files in os.walk(self.directory) for name in files if name.endswith(".json"))
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        stub = self.server.stub
+        stub.count("requests")
+        split = urlsplit(self.path)
+        params = dict(parse_qsl(split.query, keep_blank_values=True))
+
+        if stub.bucket:
+            retry_after = stub.bucket.take()
+            if retry_after:
+                stub.count("throttled")
+                return self._error(429, "rate limit exceeded", {"Retry-After": str(max(1, round(retry_after)))})
+        if stub.error_rate and stub.rng.random() < stub.error_rate:
+            stub.count("failed")
+            return self._error(503, "injected failure")
+
+        meta, body_file = stub.recordings.get(split.path, params)
+        if meta is None:
+            if not stub.upstream:
+                stub.count("missing")
+                return self._error(404, f"no recording for {split.path} {params}")
+            try:
+                with requests.get(stub.upstream + split.path, params=params, stream=True) as resp:
+                    if resp.status_code != 200:
+                        stub.count("failed")
+                        return self._error(resp.status_code, f"upstream answered {resp.status_code}")
+                    meta, body_file = stub.recordings.record(split.path, params, resp)
+            except requests.RequestException as e:
+                stub.count("failed")
+                return self._error(502, f"upstream error: {e}")
+            stub.count("recorded")
+        else:
+            stub.count("replayed")
+
+        if stub.latency or stub.jitter:
+            time.sleep(max(0.0, stub.latency + stub.rng.uniform(-stub.jitter, stub.jitter)))
+        self.send_response(meta["status"])
+        self.send_header("Content-Type", meta["content_type"])
+        self.send_header("Content-Length", str(meta["size"]))
+        self.end_headers()
+        with gzip.open(body_file, "rb") as f:
+            while True:
+                chunk = f.read(COPY_CHUNK_BYTES)
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+
+    def _error(self, status, message, headers=None):
+        body = json.dumps({"status": "error", "status_code": status, "messages": [["error", message]]}).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.server.stub.quiet:
+            super().log_message(format, *args)
+
+
+class Stub:
+    """Settings and counters shared by all request handlers."""
+
+    def __init__(self, recordings, upstream=None, latency=0.0, jitter=0.0, rate=None, burst=None,
+                 error_rate=0.0, seed=None, quiet=False):
+        self.recordings = recordings
+        self.upstream = upstream.rstrip("/") if upstream else None
+        self.latency = latency
+        self.jitter = jitter
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.quiet = quiet
+        self.lock = threading.Lock()
+        self.counts = dict.fromkeys(["requests", "replayed", "recorded", "missing", "throttled", "failed"], 0)
+
+    def count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    def summary(self):
+        return ", ".join(f"{n} {name}" for name, n in self.counts.items())
+
+
+def make_server(stub, host="127.0.0.1", port=8080):
+    """ThreadingHTTPServer serving stub; port 0 picks a free port (see server.server_address)."""
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.stub = stub
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record/replay stand-in for the RIPEstat Data API")
+    parser.add_argument("mode", choices=["record", "serve"],
+                        help="record: forward misses to --upstream and save them; serve: recordings only")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--dir", default=RECORDINGS_DIR, help="recordings directory")
+    parser.add_argument("--upstream", default=DEFAULT_BASE_URL, help="real RIPEstat base URL (record mode)")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- random seconds on top of --latency")
+    parser.add_argument("--rate", type=float, default=None, help="requests/sec before answering 429")
+    parser.add_argument("--burst", type=float, default=None, help="token bucket size (default: --rate)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 503")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--quiet", action="store_true", help="no per-request log lines")
+    args = parser.parse_args()
+
+    recordings = Recordings(args.dir)
+    stub = Stub(recordings, upstream=args.upstream if args.mode == "record" else None,
+                latency=args.latency, jitter=args.jitter, rate=args.rate, burst=args.burst,
+                error_rate=args.error_rate, seed=args.seed, quiet=args.quiet)
+    server = make_server(stub, args.host, args.port)
+    host, port = server.server_address[:2]
+    print(f"RIPEstat stub ({args.mode}) on http://{host}:{port} with {len(recordings)} recordings in {args.dir}")
+    print(f"Use: RIPESTAT_BASE_URL=http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(stub.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+"""
+RIPEstat endpoint URLs.
+
+All Data API calls in the BGP scripts are built from one base URL, which
+defaults to the public service and can be pointed elsewhere (for example at
+ripestat_stub.py) with the RIPESTAT_BASE_URL environment variable:
+
+    RIPESTAT_BASE_URL=http://127.0.0.1:8080 python Optimized_checks.py
+"""
+import os
+
+DEFAULT_BASE_URL = "https://stat.ripe.net"
+BASE_URL = os.environ.get("RIPESTAT_BASE_URL", DEFAULT_BASE_URL).rstrip("/")
+
+
+def data_url(endpoint, base_url=None):
+    """URL of a Data API endpoint, e.g. data_url("bgplay")."""
+    return f"{(base_url or BASE_URL).rstrip('/')}/data/{endpoint}/data.json"
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Continuous route monitor for one prefix.
+
+Builds the replay state once from a short BGPlay window ending now, then on
+every tick asks RIPEstat bgp-updates only for the updates since its
+high-water mark and applies them to the state in memory. An alert line is
+printed (and optionally appended to a file) the moment a path through a
+watched upstream appears or disappears. Nothing is re-downloaded or
+re-replayed, so a tick costs one small request.
+
+Each query reaches back a little before the high-water mark because route
+collectors publish with a delay; updates already applied in that overlap
+are recognised and skipped, and a late update older than one already
+applied for the same peer and prefix is dropped rather than replayed out
+of order.
+
+Examples:
+    python route_monitor.py
+    python route_monitor.py --interval 60 --alert-file alerts.log
+"""
+import argparse
+import time
+from datetime import datetime, timezone
+
+from bgplay_fetch import fetch_bgplay
+from bgplay_replay import ReplayState, event_kind, event_ts, parse_bgplay, raw_path, route_key
+from ripestat_client import default_client
+from ripestat_urls import data_url
+
+UPDATES_URL = data_url("bgp-updates")
+
+# === Parameters ===
+PREFIX = "102.217.0.0/22"
+MY_ASN = "329001"
+UPSTREAMS = {
+    "GLO": "37148",
+    "Dolphin": "37613",
+}
+
+INTERVAL_SECONDS = 60        # time between polls
+BOOTSTRAP_SECONDS = 3600     # BGPlay window the initial state is built from
+OVERLAP_SECONDS = 900        # how far each poll reaches back for late-published updates
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+
+def _utc(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
+
+
+class RouteMonitor:
+    def __init__(self, prefix, my_asn, upstreams, client=None, overlap=OVERLAP_SECONDS, alert_file=None):
+        """upstreams maps a display name to its ASN, e.g. {"GLO": "37148"}."""
+        self.prefix = prefix
+        self.names = list(upstreams)
+        self.state = ReplayState(my_asn, [str(upstreams[name]) for name in self.names])
+        self.client = client or default_client()
+        self.overlap = overlap
+        self.alert_file = alert_file
+        self.hwm = None
+        # Updates applied within the overlap window, to recognise them when they come back
+        self.recent = {}
+        # {route key: ts of the newest update applied for it}
+        self.latest = {}
+        self.last_mask = 0
+
+    # === Alerts ===
+    def alert(self, line):
+        print(line, flush=True)
+        if self.alert_file:
+            with open(self.alert_file, "a") as f:
+                f.write(line + "\n")
+
+    def _check(self, ts):
+        changed = self.state.mask ^ self.last_mask
+        for i, name in enumerate(self.names):
+            if changed & (1 << i):
+                present = bool(self.state.mask & (1 << i))
+                self.alert(f"{_utc(ts)} ALERT {self.prefix}: path via {name} (AS{self.state.upstreams[i]}) "
+                           f"{'appeared' if present else 'disappeared'} "
+                           f"({self.state.upstream_counts[i]} active routes)")
+        self.last_mask = self.state.mask
+
+    def status(self):
+        return " | ".join(f"{name}: {'Yes' if self.state.mask & (1 << i) else 'No'} "
+                          f"({self.state.upstream_counts[i]} routes)" for i, name in enumerate(self.names))
+
+    # === Updates ===
+    def bootstrap(self, now=None, window=BOOTSTRAP_SECONDS):
+        """Builds the state from the BGPlay window [now - window, now]."""
+        now = int(now if now is not None else time.time())
+        start = now - window
+        data = fetch_bgplay(self.prefix, datetime.fromtimestamp(start, timezone.utc),
+                            datetime.fromtimestamp(now, timezone.utc), client=self.client)
+        initial_state, events = parse_bgplay(data)
+        self.state.load(initial_state)
+        self.hwm = start
+        self.last_mask = self.state.mask
+        self.apply(events)
+        self.hwm = max(self.hwm, now - self.overlap)
+        print(f"{_utc(now)} monitoring {self.prefix}: {self.status()}", flush=True)
+
+    def apply(self, updates):
+        """Applies time-sorted updates not seen before; returns how many were new."""
+        applied = 0
+        for ev in updates:
+            ts = event_ts(ev)
+            kind = event_kind(ev)
+            path = raw_path(ev)
+            key = route_key(ev)
+            sig = (ts, kind, key, path)
+            if ts < self.hwm - self.overlap or sig in self.recent:
+                continue
+            # Published late, but superseded by a newer update for the same route already applied
+            if key is not None and ts < self.latest.get(key, ts):
+                continue
+            self.recent[sig] = ts
+            if key is not None:
+                self.latest[key] = ts
+            self.state.apply_record(kind, path, key)
+            self._check(ts)
+            self.hwm = max(self.hwm, ts)
+            applied += 1
+        cutoff = self.hwm - self.overlap
+        self.recent = {sig: ts for sig, ts in self.recent.items() if ts >= cutoff}
+        return applied
+
+    def poll(self, now=None):
+        """Fetches and applies the updates since the high-water mark."""
+        now = int(now if now is not None else time.time())
+        params = {"resource": self.prefix, "starttime": _iso(self.hwm - self.overlap), "endtime": _iso(now)}
+        data = self.client.get_json(UPDATES_URL, params).get("data", {})
+        updates = sorted(data.get("updates", []) or [], key=event_ts)
+        applied = self.apply(updates)
+        # Nothing older than now - overlap is still to come, even on a quiet prefix
+        self.hwm = max(self.hwm, now - self.overlap)
+        return applied
+
+    def run(self, interval=INTERVAL_SECONDS):
+        if self.hwm is None:
+            self.bootstrap()
+        while True:
+            time.sleep(interval)
+            try:
+                applied = self.poll()
+            except Exception as e:
+                # The client already retried; keep the state and try again next tick
+                print(f"{_utc(time.time())} poll failed: {e}", flush=True)
+                continue
+            if applied:
+                print(f"{_utc(time.time())} {applied} update(s) | {self.status()}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Continuously monitor upstream paths for a prefix")
+    parser.add_argument("--prefix", default=PREFIX)
+    parser.add_argument("--my-asn", default=MY_ASN)
+    parser.add_argument("--upstream", action="append", metavar="NAME=ASN",
+                        help="watched upstream (repeatable); default GLO and Dolphin")
+    parser.add_argument("--interval", type=float, default=INTERVAL_SECONDS)
+    parser.add_argument("--bootstrap", type=int, default=BOOTSTRAP_SECONDS)
+    parser.add_argument("--overlap", type=int, default=OVERLAP_SECONDS)
+    parser.add_argument("--alert-file")
+    args = parser.parse_args()
+
+    upstreams = dict(u.split("=", 1) for u in args.upstream) if args.upstream else UPSTREAMS
+    monitor = RouteMonitor(args.prefix, args.my_asn, upstreams, overlap=args.overlap, alert_file=args.alert_file)
+    monitor.bootstrap(window=args.bootstrap)
+    try:
+        monitor.run(args.interval)
+    except KeyboardInterrupt:
+        print(monitor.client.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Columnar route-history store (Parquet, partitioned by month).
+
+Three tables live under the store directory, each split into month=YYYY-MM
+partitions with one file per prefix:
+
+    daily/      one row per (date, prefix, upstream): seen, dwell_seconds,
+                changes, peer_share and the day's announcements,
+                withdrawals, path_changes and flaps
+    hourly/     the same update counters per (date, hour, prefix, upstream)
+    intervals/  one row per span during which a prefix was reachable through
+                an upstream: start and end (half-open, UTC)
+
+Queries only open the partitions in the requested date range and read only
+the columns they need. Writing a day again replaces its earlier rows.
+Needs pyarrow (pip install pyarrow).
+
+Examples:
+    python route_store.py days --from 2024-01-01 --to 2024-12-31 --upstream GLO --absent
+    python route_store.py summary --from 2025-01-01 --to 2025-12-31
+    python route_store.py intervals --from 2025-09-01 --to 2025-09-07 --upstream Dolphin
+    python route_store.py churn --from 2025-09-01 --to 2025-09-30 --upstream GLO
+    python route_store.py import-csv data_2025-09-01_to_2025-09-30.csv --prefix 102.217.0.0/22 --origin 329001
+"""
+import argparse
+import csv
+import os
+import time
+from collections import defaultdict
+from datetime import date, datetime, timezone
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pc = ds = pq = None
+
+STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "route_store")
+
+# Upstream names used by the existing CSVs (<name>_upstream columns)
+UPSTREAM_NAMES = {
+    "GLO": "37148",
+    "Dolphin": "37613",
+}
+
+if pa is not None:
+    DAILY_SCHEMA = pa.schema([
+        ("date", pa.date32()),
+        ("prefix", pa.string()),
+        ("origin", pa.string()),
+        ("upstream", pa.string()),
+        ("upstream_name", pa.string()),
+        ("seen", pa.bool_()),
+        ("dwell_seconds", pa.int64()),
+        ("changes", pa.int32()),
+        ("peer_share", pa.float64()),
+        ("announcements", pa.int32()),
+        ("withdrawals", pa.int32()),
+        ("path_changes", pa.int32()),
+        ("flaps", pa.int32()),
+    ])
+    HOURLY_SCHEMA = pa.schema([
+        ("date", pa.date32()),
+        ("hour", pa.int8()),
+        ("prefix", pa.string()),
+        ("origin", pa.string()),
+        ("upstream", pa.string()),
+        ("upstream_name", pa.string()),
+        ("announcements", pa.int32()),
+        ("withdrawals", pa.int32()),
+        ("path_changes", pa.int32()),
+        ("flaps", pa.int32()),
+    ])
+    INTERVAL_SCHEMA = pa.schema([
+        ("date", pa.date32()),
+        ("prefix", pa.string()),
+        ("origin", pa.string()),
+        ("upstream", pa.string()),
+        ("upstream_name", pa.string()),
+        ("start", pa.timestamp("s", tz="UTC")),
+        ("end", pa.timestamp("s", tz="UTC")),
+    ])
+    SCHEMAS = {"daily": DAILY_SCHEMA, "hourly": HOURLY_SCHEMA, "intervals": INTERVAL_SCHEMA}
+    PARTITIONING = ds.partitioning(pa.schema([("month", pa.string())]), flavor="hive")
+
+CHURN_FIELDS = ("announcements", "withdrawals", "path_changes", "flaps")
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("route_store needs pyarrow: pip install pyarrow")
+
+
+def _date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _safe(prefix):
+    return prefix.replace("/", "_").replace(":", "-")
+
+
+def _conform(table, schema):
+    """table with schema's columns, adding columns missing from older files as nulls."""
+    return pa.table({field.name: table[field.name] if field.name in table.column_names
+                     else pa.nulls(table.num_rows, field.type) for field in schema}, schema=schema)
+
+
+class RouteStore:
+    def __init__(self, root=STORE_DIR):
+        _require_pyarrow()
+        self.root = root
+        # {(table name, month, prefix): ([row dict, ...], {dates replaced})} waiting for flush()
+        self.pending = defaultdict(lambda: ([], set()))
+
+    # === Writing ===
+    def add_day(self, day, prefix, origin, presence, names=None):
+        """
+        Queues one day of upstream_presence() output for prefix.
+
+        names maps upstream ASN to its display name (e.g. "GLO"). Interval
+        and hourly rows are written when the presence entries carry
+        "intervals" and "hourly" (with_intervals / with_churn); the day's
+        earlier rows are replaced in all three tables either way.
+        """
+        day = _date(day)
+        names = names or {}
+        month = day.strftime("%Y-%m")
+        daily, daily_days = self.pending[("daily", month, prefix)]
+        hourly, hourly_days = self.pending[("hourly", month, prefix)]
+        intervals, interval_days = self.pending[("intervals", month, prefix)]
+        daily_days.add(day)
+        hourly_days.add(day)
+        interval_days.add(day)
+        for asn, p in presence.items():
+            base = {"date": day, "prefix": prefix, "origin": str(origin), "upstream": str(asn),
+                    "upstream_name": names.get(str(asn), str(asn))}
+            daily.append(dict(base, seen=bool(p["seen"]), dwell_seconds=p.get("dwell_seconds"),
+                              changes=p.get("changes"), peer_share=p.get("peer_share"),
+                              **{field: p.get(field) for field in CHURN_FIELDS}))
+            if "hourly" in p:
+                hours = p["hourly"]
+                hourly.extend(dict(base, hour=h, **{field: hours[field][h] for field in CHURN_FIELDS})
+                              for h in range(len(hours["announcements"]))
+                              if any(hours[field][h] for field in CHURN_FIELDS))
+            if "intervals" in p:
+                intervals.extend(dict(base, start=datetime.fromtimestamp(start, timezone.utc),
+                                      end=datetime.fromtimestamp(end, timezone.utc))
+                                 for start, end in p["intervals"])
+
+    def flush(self):
+        """Writes queued rows, replacing stored rows for the same days and prefix."""
+        for (name, month, prefix), (rows, days) in sorted(self.pending.items()):
+            schema = SCHEMAS[name]
+            filename = os.path.join(self.root, name, f"month={month}", f"{_safe(prefix)}.parquet")
+            new = pa.Table.from_pylist(rows, schema=schema)
+            if os.path.exists(filename):
+                old = _conform(pq.read_table(filename), schema)
+                replaced = pa.array(sorted(days), pa.date32())
+                old = old.filter(pc.invert(pc.is_in(old["date"], value_set=replaced)))
+                new = pa.concat_tables([old, new])
+            elif not rows:
+                continue
+            new = new.sort_by([("date", "ascending")] + [("hour", "ascending")] * (name == "hourly")
+                              + [("upstream", "ascending")])
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            tmp = filename + ".tmp"
+            pq.write_table(new, tmp)
+            os.replace(tmp, filename)
+        self.pending.clear()
+
+    # === Reading ===
+    def _dataset(self, name):
+        path = os.path.join(self.root, name)
+        if not os.path.isdir(path):
+            return None
+        return ds.dataset(path, format="parquet", partitioning=PARTITIONING,
+                          schema=SCHEMAS[name].append(pa.field("month", pa.string())))
+
+    def scan(self, name, columns, first_day=None, last_day=None, prefix=None, upstream=None, where=None):
+        """
+        pyarrow Table with the given columns of table name ("daily", "hourly" or "intervals").
+
+        first_day/last_day bound the date (inclusive) and prune month
+        partitions; upstream matches the ASN or the display name; where is an
+        extra pyarrow.dataset expression.
+        """
+        dataset = self._dataset(name)
+        if dataset is None:
+            schema = SCHEMAS[name]
+            return pa.table({c: pa.array([], schema.field(c).type) for c in columns})
+        expr = None
+
+        def both(e):
+            return e if expr is None else expr & e
+
+        if first_day:
+            first_day = _date(first_day)
+            expr = both((ds.field("month") >= first_day.strftime("%Y-%m")) & (ds.field("date") >= first_day))
+        if last_day:
+            last_day = _date(last_day)
+            expr = both((ds.field("month") <= last_day.strftime("%Y-%m")) & (ds.field("date") <= last_day))
+        if prefix:
+            expr = both(ds.field("prefix") == prefix)
+        if upstream:
+            expr = both((ds.field("upstream") == str(upstream)) | (ds.field("upstream_name") == str(upstream)))
+        if where is not None:
+            expr = both(where)
+        return dataset.to_table(columns=columns, filter=expr)
+
+    def days(self, first_day=None, last_day=None, upstream=None, prefix=None, seen=None):
+        """[(date, prefix, upstream_name), ...] rows, optionally only seen (True) or absent (False) days."""
+        where = None if seen is None else (ds.field("seen") == seen)
+        t = self.scan("daily", ["date", "prefix", "upstream_name"], first_day, last_day, prefix, upstream, where)
+        return sorted(zip(*(t[c].to_pylist() for c in t.column_names)))
+
+
+# === CSV import ===
+def import_csv(store, filename, prefix, origin, names=UPSTREAM_NAMES):
+    """
+    Loads a month CSV written by the audit scripts into the store.
+
+    Reads Date and <name>_upstream columns, plus <name>_seconds,
+    <name>_peer_pct and the <name>_<update counter> columns when present.
+    Returns the number of days imported.
+    """
+    count = 0
+    with open(filename, newline="") as f:
+        for row in csv.DictReader(f):
+            presence = {}
+            for name, asn in names.items():
+                if f"{name}_upstream" not in row:
+                    continue
+                seconds = row.get(f"{name}_seconds")
+                pct = row.get(f"{name}_peer_pct")
+                presence[asn] = {"seen": row[f"{name}_upstream"] == "Yes",
+                                 "dwell_seconds": int(seconds) if seconds not in (None, "") else None,
+                                 "changes": None,
+                                 "peer_share": float(pct) / 100 if pct not in (None, "") else None}
+                for field in CHURN_FIELDS:
+                    value = row.get(f"{name}_{field}")
+                    presence[asn][field] = int(value) if value not in (None, "") else None
+            store.add_day(row["Date"], prefix, origin, presence, {asn: name for name, asn in names.items()})
+            count += 1
+    store.flush()
+    return count
+
+
+# === Command line ===
+def main():
+    parser = argparse.ArgumentParser(description="Query the route-history store")
+    parser.add_argument("--store", default=STORE_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def range_args(p):
+        p.add_argument("--from", dest="first_day")
+        p.add_argument("--to", dest="last_day")
+        p.add_argument("--prefix")
+        p.add_argument("--upstream", help="ASN or name, e.g. 37148 or GLO")
+
+    p = sub.add_parser("days", help="list days, e.g. days with no path through an upstream")
+    range_args(p)
+    group = p.add_mutually_exclusive_group()
+    group.add_argument("--absent", action="store_true", help="only days the upstream was never seen")
+    group.add_argument("--seen", action="store_true", help="only days the upstream was seen")
+
+    p = sub.add_parser("summary", help="days seen and hours carried per prefix and upstream")
+    range_args(p)
+
+    p = sub.add_parser("intervals", help="spans during which an upstream carried the prefix")
+    range_args(p)
+
+    p = sub.add_parser("churn", help="announcements, withdrawals, path changes and flaps per day (or hour)")
+    range_args(p)
+    p.add_argument("--hourly", action="store_true", help="one line per hour with any updates")
+
+    p = sub.add_parser("import-csv", help="load audit CSVs into the store")
+    p.add_argument("files", nargs="+")
+    p.add_argument("--prefix", required=True)
+    p.add_argument("--origin", required=True)
+
+    args = parser.parse_args()
+    store = RouteStore(args.store)
+    started = time.perf_counter()
+
+    if args.command == "import-csv":
+        for filename in args.files:
+            print(f"{filename}: {import_csv(store, filename, args.prefix, args.origin)} days")
+    elif args.command == "days":
+        seen = True if args.seen else False if args.absent else None
+        rows = store.days(args.first_day, args.last_day, args.upstream, args.prefix, seen)
+        for day, prefix, name in rows:
+            print(f"{day} | {prefix} | {name}")
+        print(f"{len(rows)} row(s)")
+    elif args.command == "summary":
+        t = store.scan("daily", ["prefix", "upstream_name", "seen", "dwell_seconds"],
+                       args.first_day, args.last_day, args.prefix, args.upstream)
+        totals = defaultdict(lambda: [0, 0, 0])
+        for prefix, name, seen, dwell in zip(*(t[c].to_pylist() for c in t.column_names)):
+            total = totals[(prefix, name)]
+            total[0] += 1
+            total[1] += bool(seen)
+            total[2] += dwell or 0
+        for (prefix, name), (days, seen_days, dwell) in sorted(totals.items()):
+            print(f"{prefix} | {name} | seen {seen_days}/{days} days | {dwell / 3600:.1f}h carried")
+    elif args.command == "intervals":
+        t = store.scan("intervals", ["prefix", "upstream_name", "start", "end"],
+                       args.first_day, args.last_day, args.prefix, args.upstream)
+        rows = sorted(zip(*(t[c].to_pylist() for c in t.column_names)), key=lambda r: (r[0], r[1], r[2]))
+        for prefix, name, start, end in rows:
+            print(f"{prefix} | {name} | {start:%Y-%m-%d %H:%M:%S} -> {end:%Y-%m-%d %H:%M:%S} "
+                  f"({(end - start).total_seconds() / 3600:.1f}h)")
+        print(f"{len(rows)} interval(s)")
+    elif args.command == "churn":
+        name = "hourly" if args.hourly else "daily"
+        keys = ["date", "hour"] if args.hourly else ["date"]
+        t = store.scan(name, keys + ["prefix", "upstream_name"] + list(CHURN_FIELDS),
+                       args.first_day, args.last_day, args.prefix, args.upstream)
+        rows = sorted(zip(*(t[c].to_pylist() for c in t.column_names)), key=lambda r: r[:len(keys) + 2])
+        # Days imported from CSVs carry no update counts
+        rows = [row for row in rows if row[len(keys) + 2] is not None]
+        for row in rows:
+            when = f"{row[0]} {row[1]:02d}:00" if args.hourly else f"{row[0]}"
+            prefix, upstream_name = row[len(keys):len(keys) + 2]
+            counts = zip(CHURN_FIELDS, row[len(keys) + 2:])
+            print(f"{when} | {prefix} | {upstream_name} | " + " | ".join(f"{field} {n}" for field, n in counts))
+        print(f"{len(rows)} row(s)")
+
+    print(f"({(time.perf_counter() - started) * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
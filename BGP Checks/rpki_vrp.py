@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Route origin validation (RFC 6811) against a local RPKI VRP export.
+
+load_vrps() reads a Validated ROA Payload export from a relying-party
+validator (the JSON "roas" list written by routinator or rpki-client, or a
+CSV with ASN, prefix and max length columns) into a PrefixTrie once per run.
+Validating a route is then one covering lookup, O(prefix length), and the
+answer is cached per (prefix, origin), so checking every route a replay
+sees adds next to nothing to a month of days.
+
+RpkiStats wraps the replay record stream like ChurnStats and OriginWatch
+and counts the valid / invalid / not-found routes observed in a window.
+"""
+import csv
+import ipaddress
+import json
+import socket
+
+from bgplay_replay import asn_int
+from prefix_trie import PrefixTrie
+
+VALID = "valid"
+INVALID = "invalid"
+NOT_FOUND = "not-found"
+
+
+def _asn(value):
+    return int(str(value).strip().upper().replace("AS", ""))
+
+
+def read_vrps(filename):
+    """Yields (prefix, asn, max_length) for every VRP in a JSON or CSV export."""
+    with open(filename, newline="") as f:
+        head = f.read(1)
+        while head and head.isspace():
+            head = f.read(1)
+        f.seek(0)
+        if head in ("{", "["):
+            data = json.load(f)
+            rows = data.get("roas", []) if isinstance(data, dict) else data
+            for row in rows:
+                prefix = row["prefix"]
+                max_length = row.get("maxLength", row.get("max_length"))
+                yield prefix, _asn(row["asn"]), int(max_length if max_length is not None else prefix.split("/")[1])
+            return
+        reader = csv.reader(f)
+        header = [name.strip().lower() for name in next(reader, [])]
+        asn_col = next(i for i, name in enumerate(header) if "asn" in name)
+        prefix_col = next(i for i, name in enumerate(header) if "prefix" in name)
+        max_col = next((i for i, name in enumerate(header) if "max" in name), None)
+        for row in reader:
+            if not row:
+                continue
+            prefix = row[prefix_col].strip()
+            max_length = row[max_col] if max_col is not None and row[max_col].strip() else prefix.split("/")[1]
+            yield prefix, _asn(row[asn_col]), int(max_length)
+
+
+class VrpIndex:
+    def __init__(self):
+        # {prefix: [(asn, max_length), ...]}
+        self.trie = PrefixTrie()
+        self.count = 0
+        self._cache = {}
+
+    def add(self, prefix, asn, max_length):
+        self.trie.setdefault(prefix, []).append((asn, max_length))
+        self.count += 1
+
+    def validate(self, prefix, origin):
+        """VALID, INVALID or NOT_FOUND for a route to prefix originated by origin."""
+        key = (prefix, origin)
+        status = self._cache.get(key)
+        if status is None:
+            status = self._cache[key] = self._validate(prefix, asn_int(origin))
+        return status
+
+    def _validate(self, prefix, origin):
+        covering = self.trie.covering(prefix)
+        if not covering:
+            return NOT_FOUND
+        length = ipaddress.ip_network(str(prefix), strict=False).prefixlen
+        for _, vrps in covering:
+            for asn, max_length in vrps:
+                # AS_SET origins stay strings and never match
+                if asn == origin and length <= max_length:
+                    return VALID
+        return INVALID
+
+
+def _span(prefix):
+    """(address family, first address, last address) of a prefix string, without ipaddress objects."""
+    addr, _, length = prefix.partition("/")
+    family = socket.AF_INET6 if ":" in addr else socket.AF_INET
+    raw = socket.inet_pton(family, addr)
+    host_bits = 8 * len(raw) - int(length)
+    first = int.from_bytes(raw, "big") >> host_bits << host_bits
+    return family, first, first | ((1 << host_bits) - 1)
+
+
+def load_vrps(filename, within=None):
+    """
+    VrpIndex of the VRPs in filename.
+
+    With within (a list of prefixes, e.g. the audited ones) only VRPs that
+    overlap them are kept; those are the only ones that can cover a route
+    for that space, and the index stays a few nodes deep.
+    """
+    spans = [_span(str(p)) for p in within] if within else None
+    index = VrpIndex()
+    for prefix, asn, max_length in read_vrps(filename):
+        if spans is not None:
+            family, first, last = _span(prefix)
+            if not any(family == f and first <= l and f_first <= last for f, f_first, l in spans):
+                continue
+        index.add(prefix, asn, max_length)
+    return index
+
+
+class RpkiStats:
+    """
+    Origin validation of the routes seen during a sweep.
+
+    Every route active at start_ts and every announcement in the window
+    counts as one observation of its (prefix, origin). results() has the
+    totals per status and, for invalid routes, how often each was observed
+    and by which collector peers.
+    """
+
+    def __init__(self, state, index, start_ts, end_ts):
+        self.state = state
+        self.index = index
+        self.start_ts = start_ts
+        self.end_ts = end_ts
+        self.seeded = False
+        self.counts = {VALID: 0, INVALID: 0, NOT_FOUND: 0}
+        # {(prefix, origin): {"observations", "peers"}}
+        self.invalid = {}
+
+    def observe(self, records):
+        for record in records:
+            ts, kind, path, key = record
+            if ts > self.start_ts:
+                self._seed()
+                if ts <= self.end_ts and kind == "A" and path and key is not None:
+                    self._check(key, self.state.table.intern(path))
+            yield record
+        self._seed()
+
+    def _seed(self):
+        if self.seeded:
+            return
+        self.seeded = True
+        for key, pid in self.state.rib.routes.items():
+            self._check(key, pid)
+
+    def _check(self, key, pid):
+        origin = self.state.table.paths[pid][-1]
+        status = self.index.validate(key[1], origin)
+        self.counts[status] += 1
+        if status == INVALID:
+            entry = self.invalid.setdefault((key[1], origin), {"observations": 0, "peers": set()})
+            entry["observations"] += 1
+            entry["peers"].add(key[0])
+
+    def results(self):
+        """{"valid", "invalid", "not_found": counts, "invalid_routes": [{"prefix", "origin", "observations", "peers"}]}."""
+        return {"valid": self.counts[VALID], "invalid": self.counts[INVALID], "not_found": self.counts[NOT_FOUND],
+                "invalid_routes": [{"prefix": prefix, "origin": str(origin), "observations": entry["observations"],
+                                    "peers": sorted(entry["peers"])}
+                                   for (prefix, origin), entry in sorted(self.invalid.items(), key=str)]}